@@ -1,3 +1,9 @@
 #!/bin/bash
 cd lib/python3.13/site-packages/db && alembic -c alembic.prod.ini upgrade head && cd /app
-gunicorn api.main:fastapi_app -w 1 -k uvicorn.workers.UvicornWorker -b 0.0.0.0:80 --forwarded-allow-ips="*"
+# HTTP server is needed by web role and by bot role taking updates through webhook,
+# other processes (bot polling workers, report scheduler) run without it
+if [[ -z "$APP_ROLES" || ",$APP_ROLES," == *",web,"* || ( ",$APP_ROLES," == *",bot,"* && -n "$BOT_WEBHOOK_URL" ) ]]; then
+    gunicorn api.main:fastapi_app -w ${GUNICORN_WORKERS:-1} -k uvicorn.workers.UvicornWorker -b 0.0.0.0:80 --forwarded-allow-ips="*"
+else
+    python -m app
+fi
@@ -9,12 +9,15 @@ from loguru import logger
 from fastapi_utils.tasks import repeat_every
 from contextlib import asynccontextmanager
 import asyncio
-import datetime as dt
+import os
+import time
 
-from api.services.subscription import SubscriptionService
-from api.services.user import UserService
+from api.services.outbox import OutboxService
+from api.services.report_scheduler import ReportSchedulerService
 from app.controller import BotController
 from app.main import setup_bot
+from app.repositories.http_client import close_http_clients, open_http_clients
+from app.roles import enabled_roles
 
 # from db.admin import attach_admin_panel
 
@@ -45,53 +48,61 @@ def register_cors(application):
     )
 
 
-@repeat_every(seconds=3600, wait_first=3600)
+@repeat_every(
+    seconds=ReportSchedulerService.tick_seconds,
+    wait_first=int(os.getenv("REPORT_SCHEDULER_START_DELAY", 10)),
+)
 async def send_reports():
-    async with UserService() as user_service:
-        users = await user_service.list(count=10000000)
-    async with SubscriptionService() as subscription_service:
-        subscriptions = await subscription_service.list(count=10000000)
-    now = dt.datetime.now(dt.UTC)
-    user_id_to_subscriptions = {user.telegram_id: [s for s in subscriptions if s.user_telegram_id == user.telegram_id] for user in users}
-    count = 0
-    for user in users:
-        try:
-            for subscription in user_id_to_subscriptions.get(user.telegram_id, []):
-                if subscription.tracking_username is None:
-                    continue
-                if now.hour * 3600 % int(subscription.tariff.tracking_report_interval) == 0:
-                    logger.debug("Creating tariff report for " + subscription.tracking_username)
-                    count += 1
-                    try:
-                        await UserService.create_report(user.telegram_id, subscription.tracking_username)
-                    except ValueError:
-                        continue
-                # await UserService.create_report(user.telegram_id, subscription.tracking_username)
-        except Exception as e:
-            logger.exception(e)
-    logger.info(f"Created {count} reports")
+    await ReportSchedulerService.tick()
 
 
 @asynccontextmanager
 async def application_lifespan(app: FastAPI):
-    await send_reports()
-
-    bot_events = setup_bot(app)
+    timings = {}
+    started_at = phase_started_at = time.perf_counter()
+
+    def finish_phase(name: str):
+        nonlocal phase_started_at
+        now = time.perf_counter()
+        timings[name] = now - phase_started_at
+        phase_started_at = now
+
+    roles = enabled_roles()
+    await open_http_clients()
+    finish_phase("http_clients")
+    if "scheduler" in roles:
+        # Only schedules the loop, first tick runs in background after start delay
+        await send_reports()
+        finish_phase("report_scheduler")
+
+    # Web role sends messages with bot even if this process doesn't take Telegram updates
+    bot_events = setup_bot(app, receive_updates="bot" in roles)
+    finish_phase("bot_setup")
+    outbox_task = None
     if bot_events is not None:
         on_startup, on_shutdown = bot_events
-    else:
-        yield
-        return
-
-    if asyncio.iscoroutinefunction(on_startup):
-        await on_startup()
-    else:
-        on_startup()
+        if asyncio.iscoroutinefunction(on_startup):
+            await on_startup()
+        else:
+            on_startup()
+        finish_phase("bot_startup")
+        outbox_task = asyncio.create_task(OutboxService.run_forever())
+
+    phases = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items())
+    logger.info(
+        f"Application started with roles {', '.join(sorted(roles))} "
+        f"in {(time.perf_counter() - started_at) * 1000:.0f}ms ({phases})"
+    )
     yield
-    if asyncio.iscoroutinefunction(on_shutdown):
-        await on_shutdown()
-    else:
-        on_shutdown()
+
+    if outbox_task is not None:
+        outbox_task.cancel()
+    if bot_events is not None:
+        if asyncio.iscoroutinefunction(on_shutdown):
+            await on_shutdown()
+        else:
+            on_shutdown()
+    await close_http_clients()
 
 
 def init_web_application():
@@ -110,11 +121,19 @@ def init_web_application():
     from api.routes.subscription import router as subscription_router
     from api.routes.web import router as web_router
     from api.routes.user import router as user_router
-
-    application.include_router(subscription_router)
-    application.include_router(web_router)
-    application.include_router(user_router)
-    application.mount("/static", StaticFiles(directory="/app/static"), name="static")
+    from api.routes.metrics import router as metrics_router
+    from api.routes.report import router as report_router
+    from api.routes.health import router as health_router
+
+    # Process with bot role only serves Telegram webhook
+    if "web" in enabled_roles():
+        application.include_router(subscription_router)
+        application.include_router(web_router)
+        application.include_router(user_router)
+        application.include_router(report_router)
+        application.mount("/static", StaticFiles(directory="/app/static"), name="static")
+    application.include_router(metrics_router)
+    application.include_router(health_router)
 
     # attach_admin_panel(application)
 
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Response, status
+from sqlalchemy import text
+import asyncio
+
+import app
+from app import main as bot_main
+from app.repositories.breaker import CircuitState, circuit_breakers
+from app.repositories.http_client import instagram_api_client
+from db import engine
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/healthz", include_in_schema=False)
+async def liveness():
+    return {"status": "ok"}
+
+
+async def _check_database() -> dict:
+    try:
+        async with asyncio.timeout(2):
+            async with engine.engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+    except Exception as e:
+        return {"ok": False, "error": repr(e), "pool": engine.engine.pool.status()}
+    return {"ok": True, "pool": engine.engine.pool.status()}
+
+
+def _check_instagram_api() -> dict:
+    open_circuits = [
+        name for name, breaker in circuit_breakers.items() if breaker.state != CircuitState.closed
+    ]
+    return {
+        # Upstream outage is served from cache, so it doesn't make instance unready
+        "degraded": bool(open_circuits),
+        "open_circuits": open_circuits,
+        "pool": instagram_api_client.stats(),
+    }
+
+
+def _check_bot() -> dict:
+    if app.bot_instance is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "webhook": bool(bot_main.BOT_WEBHOOK_URL),
+        "webhook_set": bot_main.webhook_set,
+    }
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readiness(response: Response):
+    database = await _check_database()
+    if not database["ok"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "ready": database["ok"],
+        "database": database,
+        "instagram_api": _check_instagram_api(),
+        "bot": _check_bot(),
+    }
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+
+from api.services.outbox import OutboxService
+from api.services.report_scheduler import ReportSchedulerService
+from app.activity import activity_tracker
+from app.coalesce import callback_coalescer
+from app.ingestion import update_ingestor
+from app.repositories.breaker import circuit_breakers_stats
+from app.repositories.cache import paged_view_cache, report_diff_cache, response_cache
+from app.repositories.http_client import http_clients
+from app.repositories.singleflight import single_flight_group
+from app.send_queue import send_scheduler
+from app.webhook_reply import webhook_reply_stats
+
+router = APIRouter(prefix="/api/metrics", tags=["Metrics"])
+
+
+@router.get("", include_in_schema=False)
+async def get_metrics():
+    return {
+        "http_pools": {client.name: client.stats() for client in http_clients},
+        "instagram_cache": response_cache.stats(),
+        "report_diff_cache": report_diff_cache.stats(),
+        "paged_view_cache": paged_view_cache.stats(),
+        "instagram_single_flight": single_flight_group.stats(),
+        "instagram_circuit_breakers": circuit_breakers_stats(),
+        "report_scheduler": ReportSchedulerService.stats(),
+        "outbox": OutboxService.stats(),
+        "telegram_send_queue": send_scheduler.stats(),
+        "webhook_reply": webhook_reply_stats.stats(),
+        "webhook_ingestion": update_ingestor.stats(),
+        "callback_coalescing": callback_coalescer.stats(),
+        "user_activity": activity_tracker.stats(),
+    }
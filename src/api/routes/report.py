@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from api.schemas.user import UserReportSchema
+from api.services.report_scheduler import ReportSchedulerService
+
+router = APIRouter(prefix="/api/report", tags=["Report"])
+
+
+@router.post("/scheduled/{scheduled_report_id}", include_in_schema=False)
+async def scheduled_report_webhook(
+    scheduled_report_id: int,
+    schema: UserReportSchema,
+    report_scheduler_service: ReportSchedulerService = Depends(ReportSchedulerService.depend),
+):
+    await report_scheduler_service.send_scheduled_report(scheduled_report_id, schema)
@@ -0,0 +1,180 @@
+from enum import Enum
+from fastapi import Response
+from loguru import logger
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy_service import BaseService
+import asyncio
+import datetime as dt
+import math
+import os
+
+from app.controller import BotController
+from app.deadline import deadline
+from app.send_queue import Lane, send_lane
+from db.read_models import OutboxRow
+from db.tables import OutboxMessage
+from db import engine
+
+
+class OutboxKind(str, Enum):
+    subscription_created = "subscription_created"
+    report = "report"
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.UTC).replace(tzinfo=None)
+
+
+class OutboxService[Table: OutboxMessage, int](BaseService):
+    """
+    Bot notifications are saved in the transaction of the change which caused them
+    and sent by dispatcher loop, so webhooks don't wait for Telegram
+    and notifications survive restarts and failed sends.
+    Messages of one chat are sent one by one in order of creation
+    """
+
+    base_table = OutboxMessage
+    engine = engine
+    session: AsyncSession
+    response: Response
+
+    batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+    poll_interval = float(os.getenv("OUTBOX_POLL_INTERVAL", 1))
+    message_budget = float(os.getenv("OUTBOX_MESSAGE_BUDGET", 60))
+    max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+    retry_backoff = float(os.getenv("OUTBOX_RETRY_BACKOFF", 5))  # Doubled on every attempt
+    # Every send holds a DB connection, keep it well below the pool size
+    concurrency = int(os.getenv("OUTBOX_CONCURRENCY", 3))
+    # Claimed message is sent again after lease if worker died while sending it
+    lease = dt.timedelta(
+        seconds=message_budget * math.ceil(batch_size / concurrency) + 30
+    )
+    sent = 0
+    retried = 0
+    dropped = 0
+    _wakeup = asyncio.Event()
+    _send_semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    def enqueue(cls, session: AsyncSession, chat_id: int, kind: OutboxKind, **payload):
+        """Add message to session, it is sent after session commit"""
+        session.add(OutboxMessage(chat_id=chat_id, kind=kind.value, payload=payload))
+        cls._wakeup.set()
+
+    async def claim(self, now: dt.datetime) -> list[OutboxRow]:
+        """
+        Lease available messages, at most one per chat: message isn't claimed
+        while an earlier message of its chat is pending
+        """
+        earlier = aliased(OutboxMessage)
+        available = (
+            select(OutboxMessage.id)
+            .where(
+                OutboxMessage.available_at <= now,
+                ~exists().where(
+                    earlier.chat_id == OutboxMessage.chat_id, earlier.id < OutboxMessage.id
+                ),
+            )
+            .order_by(OutboxMessage.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(available))
+            .values(available_at=now + self.lease)
+            .returning(*(getattr(OutboxMessage, field) for field in OutboxRow._fields))
+            .execution_options(synchronize_session=False)
+        )
+        return [OutboxRow(*row) for row in await self.session.execute(query)]
+
+    async def finish(self, sent_ids: list[int], failed: dict[int, str], now: dt.datetime):
+        if sent_ids:
+            await self.session.execute(
+                delete(OutboxMessage).where(OutboxMessage.id.in_(sent_ids))
+            )
+        for message_id, error in failed.items():
+            message = await self.session.get(OutboxMessage, message_id)
+            if message is None:
+                continue
+            message.attempts += 1
+            message.last_error = error
+            if message.attempts >= self.max_attempts:
+                logger.error(
+                    f"Outbox message {message.id} ({message.kind}) to {message.chat_id} "
+                    f"dropped after {message.attempts} attempts: {error}"
+                )
+                await self.session.delete(message)
+                OutboxService.dropped += 1
+                continue
+            message.available_at = now + dt.timedelta(
+                seconds=self.retry_backoff * 2 ** (message.attempts - 1)
+            )
+            OutboxService.retried += 1
+
+    @classmethod
+    async def _send(cls, message: OutboxRow):
+        # Notifications give way to replies of users who are waiting for them
+        with send_lane(Lane.report):
+            async with cls._send_semaphore, deadline(cls.message_budget):
+                match message.kind:
+                    case OutboxKind.subscription_created:
+                        await BotController.send_subscription_created(
+                            message.chat_id, message.payload.get("tracking_username")
+                        )
+                    case OutboxKind.report:
+                        await BotController.send_report(
+                            message.chat_id,
+                            message.payload["tracking_username"],
+                            message.payload["report_id"],
+                        )
+                    case _:
+                        raise ValueError(f"Unknown outbox message kind {message.kind}")
+
+    @classmethod
+    async def dispatch(cls) -> int:
+        """Send one batch of messages, return count of claimed ones"""
+        async with cls() as service:
+            messages = await service.claim(_utcnow())
+        if not messages:
+            return 0
+        results = await asyncio.gather(
+            *(cls._send(message) for message in messages), return_exceptions=True
+        )
+        sent_ids, failed = [], {}
+        for message, result in zip(messages, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Failed to send outbox message {message.id}: {result!r}")
+                failed[message.id] = repr(result)
+            else:
+                sent_ids.append(message.id)
+        async with cls() as service:
+            await service.finish(sent_ids, failed, _utcnow())
+        OutboxService.sent += len(sent_ids)
+        return len(messages)
+
+    @classmethod
+    async def run_forever(cls):
+        """Dispatcher loop, safe to run in several processes at once"""
+        while True:
+            try:
+                if await cls.dispatch():
+                    continue
+            except Exception as e:
+                logger.exception(e)
+            cls._wakeup.clear()
+            try:
+                await asyncio.wait_for(cls._wakeup.wait(), cls.poll_interval)
+            except TimeoutError:
+                pass
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "sent": cls.sent,
+            "retried": cls.retried,
+            "dropped": cls.dropped,
+        }
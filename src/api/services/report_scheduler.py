@@ -0,0 +1,362 @@
+from fastapi import HTTPException, Response
+from loguru import logger
+from sqlalchemy import Integer, case, cast, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy_service import BaseService
+import asyncio
+import datetime as dt
+import math
+import os
+import time
+import zlib
+
+from api.schemas.user import UserReportSchema
+from api.services.user import UserService
+from api.services.outbox import OutboxKind, OutboxService
+from app.activity import activity_tracker
+from app.ratelimit import AdaptiveConcurrencyLimiter, PerMinuteCounter, TokenBucket
+from app.repositories.breaker import is_upstream_failure
+from app.repositories.instagram import InstagramRepository
+from app.schemas.exception import ApiException
+from db.read_models import ReportWindow, ScheduledReportRef, stream_scalars
+from db.tables import ScheduledReport, Subscription, Tariff, User
+from db import engine
+
+
+def _seconds(value):
+    return func.make_interval(0, 0, 0, 0, 0, 0, value)
+
+
+class ReportSchedulerService[Table: Subscription, int](BaseService):
+    """
+    Create tariff reports of subscriptions which are due, one per username and window.
+    Subscription.next_report_at is aligned to the epoch plus per username offset,
+    e.g. 00:17 and 12:17 UTC for 12h interval
+    """
+
+    base_table = Subscription
+    engine = engine
+    session: AsyncSession
+    response: Response
+
+    batch_size = int(os.getenv("REPORT_SCHEDULER_BATCH_SIZE", 500))
+    tick_seconds = int(os.getenv("REPORT_SCHEDULER_TICK", 60))
+    report_rate_limiter = TokenBucket(
+        rate=float(os.getenv("REPORT_CREATION_RATE", 5)),
+        capacity=float(os.getenv("REPORT_CREATION_BURST", 10)),
+    )
+    dispatched_per_minute = PerMinuteCounter()
+    report_concurrency_limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=int(os.getenv("REPORT_CREATION_CONCURRENCY", 10)),
+        max_limit=int(os.getenv("REPORT_CREATION_MAX_CONCURRENCY", 50)),
+    )
+    deduplicated = 0  # Due subscriptions served by report of another subscriber
+    # Report windows not created because all subscribers of username are dormant
+    dormant_skipped_reports = 0
+    scheduled_report_retention = dt.timedelta(
+        days=int(os.getenv("SCHEDULED_REPORT_RETENTION_DAYS", 7))
+    )
+    _interval = cast(Tariff.tracking_report_interval, Integer)
+    schedule_epoch = dt.datetime(1970, 1, 1)
+
+    @staticmethod
+    def report_offset(tracking_username: str, interval: int) -> int:
+        """
+        Deterministic offset of username reports inside interval, at minute granularity.
+        Spreads reports of one tariff over the whole interval instead of one hour,
+        while subscribers of one username share the slot and therefore one upstream report
+        """
+        minutes = max(interval // 60, 1)
+        key = f"{tracking_username}:{interval}".encode()
+        return zlib.crc32(key) % minutes * 60
+
+    @classmethod
+    def first_report_at(
+        cls, now: dt.datetime, tracking_username: str, interval: int
+    ) -> dt.datetime:
+        """
+        Nearest slot not earlier than now: epoch + offset + N * interval.
+        Slots are anchored to the epoch, so intervals which don't divide a day
+        keep one phase whenever subscription is scheduled
+        """
+        start = cls.schedule_epoch + dt.timedelta(
+            seconds=cls.report_offset(tracking_username, interval)
+        )
+        slots = math.ceil((now - start).total_seconds() / interval)
+        return start + dt.timedelta(seconds=slots * interval)
+
+    async def initialize_schedule(self, now: dt.datetime) -> int:
+        """Set next_report_at of new subscriptions, return count of scheduled ones"""
+        query = (
+            select(
+                Subscription.id,
+                Subscription.tracking_username,
+                Tariff.tracking_report_interval,
+            )
+            .join(Tariff, Subscription.tariff_id == Tariff.id)
+            .where(
+                Subscription.next_report_at.is_(None),
+                Subscription.tracking_username.is_not(None),
+            )
+            .limit(self.batch_size)
+            .with_for_update(of=Subscription, skip_locked=True)
+        )
+        rows = (await self.session.execute(query)).all()
+        if rows:
+            await self.session.execute(
+                update(Subscription),
+                [
+                    {
+                        "id": row.id,
+                        "next_report_at": self.first_report_at(
+                            now,
+                            row.tracking_username,
+                            int(row.tracking_report_interval),
+                        ),
+                    }
+                    for row in rows
+                ],
+            )
+        return len(rows)
+
+    async def claim_due(self, now: dt.datetime) -> tuple[set[ReportWindow], int]:
+        """
+        Advance next_report_at of due subscriptions past now and return their windows
+        and count of claimed subscriptions.
+        Missed slots are skipped, but the phase of schedule is kept.
+        Subscriptions of dormant users skip dormant_interval_factor - 1 slots.
+        Safe to run in several workers at once: due rows are locked with SKIP LOCKED,
+        so every row is claimed by exactly one of them
+        """
+        due = (
+            select(Subscription.id)
+            .where(
+                Subscription.next_report_at <= now,
+                Subscription.tracking_username.is_not(None),
+            )
+            .order_by(Subscription.next_report_at)
+            .limit(self.batch_size)
+            # Rows claimed by another worker are skipped instead of waited for
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        elapsed = func.extract("epoch", now - Subscription.next_report_at)
+        dormant_since = now - activity_tracker.dormant_after
+        dormant = User.last_activity_at < dormant_since
+        other = aliased(Subscription)
+        other_tariff = aliased(Tariff)
+        other_user = aliased(User)
+        # Skipped slots of dormant subscription are still reported if active user shares them
+        shared_with_active = exists().where(
+            other.tracking_username == Subscription.tracking_username,
+            other.tariff_id == other_tariff.id,
+            cast(other_tariff.tracking_report_interval, Integer) == self._interval,
+            other.user_telegram_id == other_user.telegram_id,
+            or_(
+                other_user.last_activity_at.is_(None),
+                other_user.last_activity_at >= dormant_since,
+            ),
+        )
+        # Dormant users get every dormant_interval_factor-th report, until they come back
+        skipped_slots = case((dormant, activity_tracker.dormant_interval_factor), else_=1)
+        query = (
+            update(Subscription)
+            .where(
+                Subscription.tariff_id == Tariff.id,
+                Subscription.user_telegram_id == User.telegram_id,
+                Subscription.id.in_(due),
+                Subscription.next_report_at <= now,
+            )
+            .values(
+                next_report_at=Subscription.next_report_at
+                + _seconds((func.floor(elapsed / self._interval) + skipped_slots) * self._interval)
+            )
+            .returning(
+                Subscription.tracking_username,
+                self._interval.label("interval"),
+                Subscription.next_report_at,
+                dormant.label("dormant"),
+                shared_with_active.label("shared_with_active"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = (await self.session.execute(query)).all()
+        windows = set()
+        skipped_windows = set()
+        for row in rows:
+            skipped_slots = activity_tracker.dormant_interval_factor if row.dormant else 1
+            window_start = row.next_report_at - dt.timedelta(seconds=row.interval * skipped_slots)
+            windows.add(ReportWindow(row.tracking_username, row.interval, window_start))
+            if row.dormant and not row.shared_with_active:
+                skipped_windows.update(
+                    ReportWindow(
+                        row.tracking_username,
+                        row.interval,
+                        window_start + dt.timedelta(seconds=row.interval * slot),
+                    )
+                    for slot in range(1, skipped_slots)
+                )
+        ReportSchedulerService.dormant_skipped_reports += len(skipped_windows)
+        return windows, len(rows)
+
+    async def register_windows(self, windows: set[ReportWindow]) -> list[ScheduledReportRef]:
+        """
+        Create scheduled report of every window which has none yet
+        and return them. Windows claimed earlier are skipped
+        """
+        if not windows:
+            return []
+        query = (
+            insert(ScheduledReport)
+            .values(
+                [
+                    {
+                        "tracking_username": window.tracking_username,
+                        "report_interval": window.interval,
+                        "window_start": window.window_start,
+                    }
+                    for window in windows
+                ]
+            )
+            .on_conflict_do_nothing(constraint="scheduled_report_uq")
+            .returning(ScheduledReport.id, ScheduledReport.tracking_username)
+        )
+        return [ScheduledReportRef(*row) for row in await self.session.execute(query)]
+
+    async def delete_expired_windows(self, now: dt.datetime):
+        await self.session.execute(
+            delete(ScheduledReport).where(
+                ScheduledReport.window_start < now - self.scheduled_report_retention
+            )
+        )
+
+    async def send_scheduled_report(self, scheduled_report_id: int, schema: UserReportSchema):
+        """
+        Queue ready report to every subscriber of username with the report's interval.
+        Dormant subscribers get it only if the window is their own slot.
+        Repeated call for the same scheduled report does nothing
+        """
+        scheduled_report = await self.session.get(ScheduledReport, scheduled_report_id)
+        if scheduled_report is None:
+            raise HTTPException(404)
+        if scheduled_report.report_id is not None:
+            # Redelivered webhook, report is queued already
+            logger.debug(f"Scheduled report {scheduled_report_id} is sent already")
+            return
+        scheduled_report.report_id = schema.report_id
+        now = dt.datetime.now(dt.UTC).replace(tzinfo=None)
+        dormant = User.last_activity_at < now - activity_tracker.dormant_after
+        # Slot of dormant subscription is the window it was claimed at, see claim_due
+        own_dormant_slot = Subscription.next_report_at == scheduled_report.window_start + dt.timedelta(
+            seconds=scheduled_report.report_interval * activity_tracker.dormant_interval_factor
+        )
+        query = (
+            select(Subscription.user_telegram_id)
+            .join(Tariff, Subscription.tariff_id == Tariff.id)
+            .join(User, Subscription.user_telegram_id == User.telegram_id)
+            .where(
+                Subscription.tracking_username == scheduled_report.tracking_username,
+                self._interval == scheduled_report.report_interval,
+                or_(dormant.is_not(True), own_dormant_slot),
+            )
+        )
+        user_telegram_ids = {
+            user_telegram_id async for user_telegram_id in stream_scalars(self.session, query)
+        }
+        for user_telegram_id in user_telegram_ids:
+            OutboxService.enqueue(
+                self.session,
+                user_telegram_id,
+                OutboxKind.report,
+                tracking_username=schema.username,
+                report_id=schema.report_id,
+            )
+        await self.session.commit()
+
+        InstagramRepository.invalidate_user_cache(schema.username)
+        logger.debug(f"Queued report {schema.report_id} to {len(user_telegram_ids)} subscribers")
+
+    @classmethod
+    async def tick(cls):
+        """Ticks don't overlap in process: repeat_every and run_forever await each one"""
+        now = dt.datetime.now(dt.UTC).replace(tzinfo=None)
+        initialized = 0
+        while True:
+            async with cls() as service:
+                count = await service.initialize_schedule(now)
+            initialized += count
+            if count < cls.batch_size:
+                break
+        if initialized:
+            logger.info(f"Scheduled reports of {initialized} subscriptions")
+        async with cls() as service:
+            await service.delete_expired_windows(now)
+
+        tasks = []
+        while True:
+            # Claim is committed before reports are requested, so report is never created twice
+            async with cls() as service:
+                windows, claimed = await service.claim_due(now)
+                scheduled_reports = await service.register_windows(windows)
+            cls.deduplicated += claimed - len(scheduled_reports)
+            for scheduled_report in scheduled_reports:
+                # Next batch isn't claimed until upstream takes the current one
+                await cls.report_concurrency_limiter.acquire()
+                tasks.append(
+                    asyncio.create_task(
+                        cls._create_scheduled_report(
+                            scheduled_report.id, scheduled_report.tracking_username
+                        )
+                    )
+                )
+            if claimed < cls.batch_size:
+                break
+        count = sum(await asyncio.gather(*tasks))
+        if count:
+            logger.info(f"Created {count} reports")
+
+    @classmethod
+    async def _create_scheduled_report(cls, scheduled_report_id: int, tracking_username: str) -> bool:
+        """Must be called with acquired report_concurrency_limiter"""
+        overloaded = False
+        started_at = time.perf_counter()
+        try:
+            await cls.report_rate_limiter.acquire()
+            started_at = time.perf_counter()
+            logger.debug("Creating tariff report for " + tracking_username)
+            await UserService.create_scheduled_report(scheduled_report_id, tracking_username)
+            cls.dispatched_per_minute.add()
+            return True
+        except Exception as e:
+            overloaded = is_upstream_failure(e)
+            if isinstance(e, ApiException):
+                logger.warning(e.message)
+            else:
+                logger.exception(e)
+            return False
+        finally:
+            await cls.report_concurrency_limiter.release(
+                time.perf_counter() - started_at, overloaded
+            )
+
+    @classmethod
+    async def run_forever(cls):
+        """Scheduler loop of dedicated scheduler process"""
+        while True:
+            try:
+                await cls.tick()
+            except Exception as e:
+                logger.exception(e)
+            await asyncio.sleep(cls.tick_seconds)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "rate_limit": cls.report_rate_limiter.stats(),
+            "dispatched_per_minute": cls.dispatched_per_minute.stats(),
+            "deduplicated": cls.deduplicated,
+            "concurrency": cls.report_concurrency_limiter.stats(),
+            "dormant_skipped_reports": cls.dormant_skipped_reports,
+        }
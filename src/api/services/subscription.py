@@ -11,7 +11,8 @@ from sqlalchemy import exc
 from sqlalchemy_service import BaseService
 
 from api.schemas.subscription import SubscriptionAddRequestsSchema, SubscriptionCreateSchema
-from app.controller import BotController
+from api.services.outbox import OutboxKind, OutboxService
+from db.read_models import TariffRow, select_rows
 from db.tables import Subscription, Tariff
 from db import engine
 
@@ -31,9 +32,9 @@ class SubscriptionService[Table: Subscription, int](BaseService):
         if signature.decode() != request.headers["Content-HMAC"]:
             raise HTTPException(401)
 
-    async def get_tariffs_list(self) -> list[Tariff]:
-        query = select(Tariff)
-        return list(await self.session.scalars(query))
+    async def get_tariffs_list(self) -> list[TariffRow]:
+        query = select_rows(TariffRow, Tariff).order_by(Tariff.id)
+        return [TariffRow(*row) for row in await self.session.execute(query)]
 
     async def get_tariffs_big_tracking_list(self) -> list:
         return self.tariffs_big_tracking
@@ -49,16 +50,18 @@ class SubscriptionService[Table: Subscription, int](BaseService):
         if schema.tracking_username:
             current_subscription = await self._get_one(tracking_username=schema.tracking_username, user_telegram_id=schema.user_telegram_id, mute_not_found_exception=True)
             if current_subscription is not None:
+                self._notify_subscription_created(schema.user_telegram_id, schema.tracking_username)
                 model = await self._update(
                     current_subscription.id,
-                    tariff_id=schema.tariff_id
+                    tariff_id=schema.tariff_id,
+                    next_report_at=None,  # Rescheduled by new tariff interval
                 )
-                await BotController.send_subscription_created(schema.user_telegram_id, schema.tracking_username)
                 return model
 
         tariff = await self.get_tariff(schema.tariff_id)
         expire_at = dt.datetime.now() + dt.timedelta(days=tariff.access_days)
 
+        self._notify_subscription_created(schema.user_telegram_id, schema.tracking_username)
         model = await self._create(
             user_telegram_id=schema.user_telegram_id,
             expire_at=expire_at,
@@ -68,28 +71,35 @@ class SubscriptionService[Table: Subscription, int](BaseService):
             cloudpayments_subscription_id=cloudpayments_subscription_id,
         )
         await self._commit()
-
-        await BotController.send_subscription_created(schema.user_telegram_id, schema.tracking_username)
         return model
 
     async def add_requests(self, schema: SubscriptionAddRequestsSchema) -> Subscription:
         tariff = await self.get_tariff(schema.tariff_id)
         subscription = await self.get(schema.user_telegram_id, schema.tracking_username)
+        self._notify_subscription_created(schema.user_telegram_id, schema.tracking_username)
         model = await self.update(subscription.id, requests_available=subscription.requests_available + tariff.requests_balance)
-        await BotController.send_subscription_created(schema.user_telegram_id, schema.tracking_username)
         return model
 
     async def create_big_tracking(self, schema: SubscriptionCreateSchema) -> Subscription:
         tariff = self.tariffs_big_tracking[schema.tariff_id]
         expire_at = dt.datetime.now() + dt.timedelta(days=tariff["access_days"])
+        self._notify_subscription_created(schema.user_telegram_id, schema.tracking_username)
         model = await self._create(
             user_telegram_id=schema.user_telegram_id,
             expire_at=expire_at,
             tariff_id=schema.tariff_id,
         )
-        await BotController.send_subscription_created(schema.user_telegram_id)
         return model
 
+    def _notify_subscription_created(self, user_telegram_id: int, tracking_username: str | None):
+        """Notification is committed together with the subscription change which follows it"""
+        OutboxService.enqueue(
+            self.session,
+            user_telegram_id,
+            OutboxKind.subscription_created,
+            tracking_username=tracking_username,
+        )
+
     async def list(self, page=None, count=None) -> list[Subscription]:
         return list(await self._get_list(page=page, count=count, select_in_load=Subscription.tariff))
 
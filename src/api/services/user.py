@@ -1,12 +1,13 @@
-import os
-from aiohttp import ClientSession
 from fastapi import Response
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy_service import BaseService
 
 from api.schemas.user import UserReportSchema
-from app.controller import BotController
+from api.services.outbox import OutboxKind, OutboxService
+from app.repositories.http_client import instagram_api_client
+from app.repositories.instagram import InstagramRepository
+from app.schemas.exception import ApiException
 from db.tables import User
 from db import engine
 
@@ -16,17 +17,32 @@ class UserService[Table: User, int](BaseService):
     engine = engine
     session: AsyncSession
     response: Response
-    instagram_api_url = os.getenv("INSTAGRAM_API_URL")
 
     @classmethod
-    async def create_report(self, telegram_id: int, username: str):
-        async with ClientSession(base_url=self.instagram_api_url) as session:
-            resp = await session.post(f"/api/user/{username}/report", json={"webhook_url": f"http://instagrambot_app/api/user/{telegram_id}/report"})
+    async def _request_report(cls, username: str, webhook_url: str):
+        async with instagram_api_client.post(f"/api/user/{username}/report", json={"webhook_url": webhook_url}) as resp:
             if resp.status != 201:
-                raise ValueError("Failed to send create report request: " + await resp.text())
+                raise ApiException("Failed to send create report request: " + await resp.text(), resp.status)
+
+    @classmethod
+    async def create_report(cls, telegram_id: int, username: str):
+        await cls._request_report(username, f"http://instagrambot_app/api/user/{telegram_id}/report")
+
+    @classmethod
+    async def create_scheduled_report(cls, scheduled_report_id: int, username: str):
+        """Report is sent to every subscriber of username by scheduled report webhook"""
+        await cls._request_report(username, f"http://instagrambot_app/api/report/scheduled/{scheduled_report_id}")
 
     async def send_report(self, telegram_id: int, schema: UserReportSchema):
-        await BotController.send_report(telegram_id, schema.username, schema.report_id)
+        InstagramRepository.invalidate_user_cache(schema.username)
+        OutboxService.enqueue(
+            self.session,
+            telegram_id,
+            OutboxKind.report,
+            tracking_username=schema.username,
+            report_id=schema.report_id,
+        )
+        await self.session.commit()
 
     async def create(self, **fields) -> User:
         return await self._create(**fields)
@@ -0,0 +1,54 @@
+"""
+Run application roles: python -m app [web] [bot] [scheduler]
+Roles are taken from APP_ROLES when not passed, all of them by default (local development).
+Every role can be deployed as separate process and scaled independently
+"""
+import asyncio
+import os
+import sys
+
+from loguru import logger
+
+from app.roles import enabled_roles
+
+
+async def run_workers(roles: set[str]):
+    """Bot polling and report scheduler without HTTP server"""
+    from api.services.outbox import OutboxService
+    from api.services.report_scheduler import ReportSchedulerService
+    from app.main import run_polling
+    from app.repositories.http_client import close_http_clients, open_http_clients
+
+    await open_http_clients()
+    try:
+        workers = []
+        if "bot" in roles:
+            workers.append(run_polling())
+            workers.append(OutboxService.run_forever())
+        if "scheduler" in roles:
+            workers.append(ReportSchedulerService.run_forever())
+        logger.info(f"Started workers with roles {', '.join(sorted(roles))}")
+        await asyncio.gather(*workers)
+    finally:
+        await close_http_clients()
+
+
+def main():
+    if len(sys.argv) > 1:
+        os.environ["APP_ROLES"] = ",".join(sys.argv[1:])
+    roles = enabled_roles()
+    # Webhook bot takes updates through HTTP server as well
+    if "web" in roles or ("bot" in roles and os.getenv("BOT_WEBHOOK_URL")):
+        import uvicorn
+
+        uvicorn.run(
+            "api.main:fastapi_app",
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", 80)),
+        )
+    else:
+        asyncio.run(run_workers(roles))
+
+
+if __name__ == "__main__":
+    main()
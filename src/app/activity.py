@@ -0,0 +1,90 @@
+import asyncio
+import datetime as dt
+import os
+
+from loguru import logger
+
+from app.repositories.subscription import SubscriptionRepository
+from app.repositories.user import UserRepository
+
+
+class ActivityTracker:
+    """
+    Write-behind last activity of users: updates are collected in memory
+    and saved in one batch every flush_interval seconds.
+    Users who come back after being dormant get their reports resumed right away
+    """
+
+    def __init__(self, flush_interval: float, dormant_after: dt.timedelta, dormant_interval_factor: int):
+        self.flush_interval = flush_interval
+        self.dormant_after = dormant_after
+        self.dormant_interval_factor = dormant_interval_factor
+        self._pending: dict[int, dt.datetime] = {}
+        self._resuming: set[int] = set()  # Users whose reports are still to be resumed
+        self._task: asyncio.Task | None = None
+
+        self.touches = 0
+        self.flushed = 0
+        self.resumed = 0
+
+    def touch(self, telegram_id: int):
+        self._pending[telegram_id] = dt.datetime.now(dt.UTC).replace(tzinfo=None)
+        self.touches += 1
+
+    async def flush(self):
+        now = dt.datetime.now(dt.UTC).replace(tzinfo=None)
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            try:
+                async with UserRepository() as user_repository:
+                    resumed = await user_repository.update_activity(pending, now - self.dormant_after)
+            except Exception:
+                # Keep activity for the next flush, newer touches win
+                self._pending = pending | self._pending
+                raise
+            self.flushed += len(pending)
+            self._resuming.update(resumed)
+        if self._resuming:
+            resuming, self._resuming = self._resuming, set()
+            try:
+                async with SubscriptionRepository() as subscription_repository:
+                    await subscription_repository.resume_reports(list(resuming), now)
+            except Exception:
+                # Activity is saved already, so users aren't dormant anymore: retry them by id
+                self._resuming |= resuming
+                raise
+            self.resumed += len(resuming)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(e)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "resuming": len(self._resuming),
+            "touches": self.touches,
+            "flushed": self.flushed,
+            "resumed": self.resumed,
+        }
+
+
+activity_tracker = ActivityTracker(
+    flush_interval=float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 30)),
+    dormant_after=dt.timedelta(days=int(os.getenv("REPORT_DORMANT_AFTER_DAYS", 14))),
+    dormant_interval_factor=int(os.getenv("REPORT_DORMANT_INTERVAL_FACTOR", 4)),
+)
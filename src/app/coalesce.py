@@ -0,0 +1,114 @@
+from typing import Any, Iterable
+import asyncio
+
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+
+from app.repositories.keyboard import KeyboardRepository
+
+PAGINATION_TEXTS = frozenset(
+    (KeyboardRepository.previous_page_text, KeyboardRepository.next_page_text)
+)
+
+TapKey = tuple[int, int]
+
+
+def _is_pagination_button(buttons: Iterable[tuple[str | None, str | None]], data: str | None) -> bool:
+    return data is not None and any(
+        text in PAGINATION_TEXTS and callback_data == data for text, callback_data in buttons
+    )
+
+
+def pagination_tap_key(query: CallbackQuery) -> TapKey | None:
+    """(chat, message) of pagination button tap, None for other callbacks"""
+    message = query.message
+    if message is None or not isinstance(message.reply_markup, InlineKeyboardMarkup):
+        return None
+    buttons = (
+        (button.text, button.callback_data)
+        for row in message.reply_markup.inline_keyboard
+        for button in row
+    )
+    if not _is_pagination_button(buttons, query.data):
+        return None
+    return message.chat.id, message.message_id
+
+
+def raw_pagination_tap_key(update: dict[str, Any]) -> TapKey | None:
+    """Same as pagination_tap_key for raw webhook update"""
+    query = update.get("callback_query")
+    if not isinstance(query, dict):
+        return None
+    message = query.get("message")
+    if not isinstance(message, dict) or not isinstance(message.get("chat"), dict):
+        return None
+    keyboard = (message.get("reply_markup") or {}).get("inline_keyboard") or []
+    buttons = (
+        (button.get("text"), button.get("callback_data"))
+        for row in keyboard
+        for button in row
+    )
+    if not _is_pagination_button(buttons, query.get("data")):
+        return None
+    return message["chat"]["id"], message["message_id"]
+
+
+class CallbackCoalescer:
+    """
+    Serialize pagination taps of one message. While a tap is processed, only the latest
+    of the next taps waits for its turn, taps superseded by it are answered at once
+    without running handler
+    """
+
+    def __init__(self):
+        # Tap key -> future of tap waiting for its turn, None if nobody waits
+        self._slots: dict[TapKey, asyncio.Future | None] = {}
+
+        self.processed = 0
+        self.coalesced = 0
+        self.queue_coalesced = 0  # Superseded in webhook ingestion queue
+
+    async def wait_turn(self, key: TapKey) -> bool:
+        """Wait until tap can be processed, return False if newer tap superseded it"""
+        if key not in self._slots:
+            self._slots[key] = None
+            return True
+        waiting = self._slots[key]
+        if waiting is not None and not waiting.done():
+            waiting.set_result(False)
+        future = self._slots[key] = asyncio.get_running_loop().create_future()
+        try:
+            turn = await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                # Turn was passed right before cancel, pass it on
+                self._pass_turn(key)
+            elif self._slots.get(key) is future:
+                self._slots[key] = None
+            raise
+        if not turn:
+            self.coalesced += 1
+        return turn
+
+    def done(self, key: TapKey):
+        """Processing of tap is finished, pass turn to waiting tap"""
+        self.processed += 1
+        self._pass_turn(key)
+
+    def _pass_turn(self, key: TapKey):
+        waiting = self._slots.get(key)
+        if waiting is not None and not waiting.done():
+            self._slots[key] = None
+            waiting.set_result(True)
+        else:
+            self._slots.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "queue_coalesced": self.queue_coalesced,
+            "in_flight": len(self._slots),
+        }
+
+
+callback_coalescer = CallbackCoalescer()
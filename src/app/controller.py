@@ -1,72 +1,78 @@
-from fastapi import Depends
-from aiogram.filters.callback_data import CallbackData
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator
 import app
-import copy
-import json
-import asyncio
 
+from app.repositories.cloudpayments import CloudpaymentsRepository
+from app.repositories.instagram import InstagramRepository
+from app.repositories.keyboard import KeyboardRepository
+from app.repositories.subscription import SubscriptionRepository
+from app.repositories.tariff import TariffRepository
+from app.repositories.tracking import TrackingRepository
+from app.repositories.user import UserRepository
 from app.schemas.action_callback import (
     Action,
-    ActionCallback,
     SubscriptionActionCallback,
-    TrackingActionCallback,
     TrackingReportCallback,
 )
+from app.services.subscription import SubscriptionService
+from app.services.tracking import TrackingService
 
 
-class BotController:
-    __webhook_data = {
-        "update_id": 0,
-        "callback_query": {
-            "id": "1",
-            "from": {"id": None, "is_bot": False, "first_name": "."},
-            "message": {
-                "message_id": 1,
-                "from": {"id": 1, "is_bot": True, "first_name": "bot"},
-                "chat": {"id": None, "first_name": ".", "type": "private"},
-                "date": 1,
-                "text": ".",
-            },
-            "data": "action:history",
-            "chat_instance": "1",
-        },
-    }
+@dataclass(slots=True, frozen=True)
+class ChatUser:
+    id: int
+
+
+@dataclass(slots=True, frozen=True)
+class ChatContext:
+    """
+    Stand-in of CallbackQuery for services called by controller.
+    Services only read from_user.id of it, messages are sent, not edited
+    """
+
+    from_user: ChatUser
 
     @classmethod
-    def _pack_webhook_data(cls, chat_id: int, data: str) -> str:
-        webhookdata = copy.deepcopy(cls.__webhook_data)
-        webhookdata["callback_query"]["from"]["id"] = chat_id
-        webhookdata["callback_query"]["message"]["chat"]["id"] = chat_id
-        webhookdata["callback_query"]["data"] = data
-        return json.dumps(webhookdata)
+    def for_chat(cls, chat_id: int) -> "ChatContext":
+        return cls(from_user=ChatUser(id=chat_id))
+
+
+class BotController:
+    """
+    Send bot messages on behalf of the application (payments, reports).
+    Services are called directly, without building updates and routing them through dispatcher.
+    Errors are raised to the caller
+    """
 
     @classmethod
     async def send_subscription_created(
         cls, user_telegram_id: int, tracking_username: str | None
     ):
-        if tracking_username is None:
-            tracking_username = ""
         data = SubscriptionActionCallback(
-            action=Action.subscription_created.action, ig_u=tracking_username, t_id=-1
-        ).pack()
-        webhook_data = cls._pack_webhook_data(user_telegram_id, data)
-
-        asyncio.create_task(
-            app.dispatcher_instance.feed_webhook_update(
-                app.bot_instance, app.bot_instance.session.json_loads(webhook_data)
-            )
+            action=Action.subscription_created.action,
+            ig_u=tracking_username or "",
+            t_id=-1,
         )
+        async with SubscriptionRepository() as subscription_repository, UserRepository() as user_repository:
+            service = SubscriptionService(
+                subscription_repository=subscription_repository,
+                cloudpayments_repository=CloudpaymentsRepository(),
+                keyboard_repository=KeyboardRepository(),
+                user_repository=user_repository,
+            )
+            method = await service.handle_subscription_add_created(
+                ChatContext.for_chat(user_telegram_id), data
+            )
+        await app.bot_instance(method)
 
     @classmethod
     async def send_reports(cls, user_telegram_id: int):
-        data = ActionCallback(action=Action.report_trackings.action).pack()
-        webhook_data = cls._pack_webhook_data(user_telegram_id, data)
-
-        asyncio.create_task(
-            app.dispatcher_instance.feed_webhook_update(
-                app.bot_instance, app.bot_instance.session.json_loads(webhook_data)
-            )
-        )
+        async with cls._tracking_service() as service:
+            async for method in service.handle_report_trackings(
+                ChatContext.for_chat(user_telegram_id)
+            ):
+                await app.bot_instance(method)
 
     @classmethod
     async def send_report(
@@ -76,11 +82,25 @@ class BotController:
             action=Action.report_trackings.action,
             username=tracking_username,
             report_id=report_id,
-        ).pack()
-        webhook_data = cls._pack_webhook_data(user_telegram_id, data)
+        )
+        async with cls._tracking_service() as service:
+            method = await service.handle_report_tracking(
+                ChatContext.for_chat(user_telegram_id), data
+            )
+        await app.bot_instance(method)
 
-        asyncio.create_task(
-            app.dispatcher_instance.feed_webhook_update(
-                app.bot_instance, app.bot_instance.session.json_loads(webhook_data)
+    @staticmethod
+    @asynccontextmanager
+    async def _tracking_service() -> AsyncIterator[TrackingService]:
+        async with (
+            TrackingRepository() as tracking_repository,
+            SubscriptionRepository() as subscription_repository,
+            TariffRepository() as tariff_repository,
+        ):
+            yield TrackingService(
+                tracking_repository=tracking_repository,
+                instagram_repository=InstagramRepository(),
+                keyboard_repository=KeyboardRepository(),
+                subscription_repository=subscription_repository,
+                tariff_repository=tariff_repository,
             )
-        )
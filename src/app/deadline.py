@@ -0,0 +1,40 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import time
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Time budget of current update or request is spent"""
+
+
+def remaining() -> float | None:
+    """Seconds left in current budget, None if there is no budget"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@asynccontextmanager
+async def deadline(seconds: float):
+    """
+    Limit enclosed code (and every call it makes) to `seconds`.
+    Nested budget can only shrink the outer one
+    """
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _deadline.set(expires_at)
+    try:
+        async with asyncio.timeout(max(expires_at - time.monotonic(), 0)):
+            yield
+    except TimeoutError as e:
+        if isinstance(e, DeadlineExceeded) or time.monotonic() < expires_at:
+            raise
+        raise DeadlineExceeded(f"Budget of {seconds}s exceeded") from e
+    finally:
+        _deadline.reset(token)
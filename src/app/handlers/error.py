@@ -8,22 +8,75 @@ from aiogram.types import Message
 from fastapi import HTTPException
 from loguru import logger
 import os
-import asyncio
 
-from app.schemas.exception import ApiException
+from app.deadline import DeadlineExceeded
+from app.middlewares.send_queue import SendQueueMiddleware
+from app.repositories.breaker import CircuitBreaker, CircuitState, state_change_listeners
+from app.schemas.exception import ApiException, UpstreamUnavailableException
+from app.send_queue import Lane, send_lane
+
+UPSTREAM_UNAVAILABLE_TEXT = "Сервис статистики временно недоступен, попробуйте позже"
+DEADLINE_EXCEEDED_TEXT = "Запрос выполняется слишком долго, попробуйте ещё раз"
 
 
 def setup_error_handlers(dispatcher: Dispatcher):
     bot_instance = Bot(os.getenv("BOT_TOKEN"))
+    bot_instance.session.middleware(SendQueueMiddleware())
 
     async def _log_error_to_admins(exc: ApiException | Exception):
         if isinstance(exc, ApiException):
             message = exc.detail() or exc.message
         else:
             message = str(exc)
-        for i in range(0, len(message), 2048):
-            await bot_instance.send_message(799377676, message[i:i + 2048])
-            await asyncio.sleep(0.05)
+        with send_lane(Lane.alert):
+            for i in range(0, len(message), 2048):
+                await bot_instance.send_message(799377676, message[i:i + 2048])
+
+    async def _log_circuit_state_to_admins(breaker: CircuitBreaker, previous_state: CircuitState):
+        # Admins are notified once per outage, not on every failed request
+        if breaker.state == CircuitState.half_open:
+            return
+        try:
+            with send_lane(Lane.alert):
+                await bot_instance.send_message(
+                    799377676, f"Instagram API {breaker.name}: {previous_state.value} -> {breaker.state.value}"
+                )
+        except Exception as e:
+            logger.warning(f"Failed to notify admins about circuit state: {e!r}")
+
+    state_change_listeners.append(_log_circuit_state_to_admins)
+
+    @dispatcher.error(
+        ExceptionTypeFilter(DeadlineExceeded), F.update.message.as_("message")
+    )
+    async def handle_deadline_exceeded_msg(event: ErrorEvent, message: Message):
+        logger.warning(f"Deadline exceeded: {event.exception}")
+        await message.answer(DEADLINE_EXCEEDED_TEXT)
+        return True
+
+    @dispatcher.error(
+        ExceptionTypeFilter(DeadlineExceeded), F.update.callback_query.as_("query")
+    )
+    async def handle_deadline_exceeded_query(event: ErrorEvent, query: CallbackQuery):
+        logger.warning(f"Deadline exceeded: {event.exception}")
+        await query.answer(DEADLINE_EXCEEDED_TEXT, show_alert=True)
+        return True
+
+    @dispatcher.error(
+        ExceptionTypeFilter(UpstreamUnavailableException), F.update.message.as_("message")
+    )
+    async def handle_upstream_unavailable_msg(event: ErrorEvent, message: Message):
+        logger.warning(f"Upstream unavailable: {event.exception.message}")
+        await message.answer(UPSTREAM_UNAVAILABLE_TEXT)
+        return True
+
+    @dispatcher.error(
+        ExceptionTypeFilter(UpstreamUnavailableException), F.update.callback_query.as_("query")
+    )
+    async def handle_upstream_unavailable_query(event: ErrorEvent, query: CallbackQuery):
+        logger.warning(f"Upstream unavailable: {event.exception.message}")
+        await query.answer(UPSTREAM_UNAVAILABLE_TEXT, show_alert=True)
+        return True
 
     @dispatcher.error(
         ExceptionTypeFilter(ApiException), F.update.message.as_("message")
@@ -77,12 +130,13 @@ def setup_error_handlers(dispatcher: Dispatcher):
             event: ErrorEvent,
             query: CallbackQuery
     ):
-        logger.exception(event.exception)
+        # Races of rapid pagination taps are coalesced before handlers, see CallbackCoalesceMiddleware
         proper_messages = ['message is not modified', 'canceled by new editMessageMedia request', 'message to delete not found', 'message to edit not found', 'bot was blocked by the user']
         if not any(msg in event.exception.message for msg in proper_messages):
             logger.exception(event.exception)
             await _log_error_to_admins(event.exception)
             return False
+        logger.debug(event.exception.message)
         try:
             await query.answer()
         except TelegramBadRequest:
@@ -1,6 +1,4 @@
-import os
 from typing import Annotated
-from aiohttp import ClientSession
 from loguru import logger
 
 from aiogram import F
@@ -12,6 +10,7 @@ from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram3_di import Depends
 
+from app.repositories.http_client import instagram_api_client
 from app.schemas.action_callback import Action, ActionCallback, TrackingActionCallback, TrackingReportCallback
 from app.schemas.forms import TrackingCreateForm
 from app.services.tracking import TrackingService
@@ -41,11 +40,11 @@ async def create_tracking_report(
         return
     tracking_username = command.args
 
-    async with ClientSession(base_url=os.getenv("INSTAGRAM_API_URL")) as session:
-        resp = await session.post(f"/api/user/{tracking_username}/report", json={"webhook_url": f"http://instagrambot_app/api/user/{message.from_user.id}/report"})
-        if resp.status != 201:
-            await bot.send_message(chat_id=message.from_user.id, text=f"Ошибка при запуске сбора: " + await resp.text())
-            return
+    async with instagram_api_client.post(f"/api/user/{tracking_username}/report", json={"webhook_url": f"http://instagrambot_app/api/user/{message.from_user.id}/report"}) as resp:
+        error_text = await resp.text() if resp.status != 201 else None
+    if error_text is not None:
+        await bot.send_message(chat_id=message.from_user.id, text=f"Ошибка при запуске сбора: " + error_text)
+        return
 
     await bot.send_message(chat_id=message.from_user.id, text=f"Сбор данных пользователя {tracking_username} запущен")
 
@@ -83,7 +82,9 @@ async def add_tracking_callback(
     await bot(method)
 
 
-@router.message(F.text.not_in([i.text for i in Action]))
+@router.message(
+    F.text.not_in([i.text for i in Action]), flags={"needs_message_id": True}
+)
 async def tracking_create(
     message: Message,
     state: FSMContext,
@@ -35,7 +35,8 @@ async def tracking_followers(
 @router.callback_query(
     TrackingReportCallback.filter(
         F.action == Action.tracking_new_subscribers.action
-    )
+    ),
+    flags={"needs_message_id": True},
 )
 async def tracking_new_subscribes(
     callback_query: CallbackQuery,
@@ -58,7 +59,8 @@ async def tracking_new_subscribes(
 @router.callback_query(
     TrackingReportCallback.filter(
         F.action == Action.tracking_new_unsubscribed.action
-    )
+    ),
+    flags={"needs_message_id": True},
 )
 async def tracking_new_unsubscribes(
     callback_query: CallbackQuery,
@@ -35,7 +35,8 @@ router = Router(name=__name__)
 @router.callback_query(
     TrackingReportCallback.filter(
         F.action == Action.tracking_subscribtions.action
-    )
+    ),
+    flags={"needs_message_id": True},
 )
 async def tracking_new_subscribes(
     callback_query: CallbackQuery,
@@ -57,7 +58,8 @@ async def tracking_new_subscribes(
 @router.callback_query(
     TrackingReportCallback.filter(
         F.action == Action.tracking_unsubscribes.action
-    )
+    ),
+    flags={"needs_message_id": True},
 )
 async def tracking_new_unsubscribes(
     callback_query: CallbackQuery,
@@ -19,7 +19,8 @@ router = Router(name=__name__)
 @router.callback_query(
     TrackingActionCallback.filter(
         F.action == Action.show_tracking_media.action
-    )
+    ),
+    flags={"needs_message_id": True},
 )
 async def show_tracking_media(
     callback_query: CallbackQuery,
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from typing import Any
+import asyncio
+import os
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import TelegramMethod
+from loguru import logger
+
+from app.coalesce import TapKey, callback_coalescer, raw_pagination_tap_key
+
+
+def update_chat_id(update: dict[str, Any]) -> int:
+    """Id of user or chat the raw update belongs to, 0 if it has none"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for holder in (event, event.get("message")):
+            if not isinstance(holder, dict):
+                continue
+            for field in ("from", "chat", "user"):
+                value = holder.get(field)
+                if isinstance(value, dict) and isinstance(value.get("id"), int):
+                    return value["id"]
+    return 0
+
+
+class UpdateIngestor:
+    """
+    Process webhook updates in background, so webhook is answered at once.
+    Updates are sharded by chat over `workers` queues: updates of one chat are processed
+    one by one in order of arrival, updates of different chats concurrently.
+    When shard queue is full update is refused and Telegram delivers it again later.
+    Redelivered updates which were taken already are skipped by update_id.
+    Queued pagination tap is answered and skipped if a newer tap on its message is queued
+    """
+
+    def __init__(self, enabled: bool, workers: int, queue_size: int, dedupe_size: int = 10000):
+        self.enabled = enabled
+        self.workers = workers
+        self.shard_queue_size = max(queue_size // workers, 1)
+        self.dedupe_size = dedupe_size
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        # Pagination tap key -> update_id of its latest queued tap
+        self._latest_taps: dict[TapKey, int] = {}
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.shed = 0
+        self.processed = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    def submit(self, update: dict[str, Any]) -> bool:
+        """Queue raw update, return False if it can't be taken now"""
+        update_id = update.get("update_id")
+        if update_id in self._seen:
+            self.duplicates += 1
+            return True
+        queue = self._queues[update_chat_id(update) % len(self._queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.shed += 1
+            return False
+        if update_id is not None:
+            tap_key = raw_pagination_tap_key(update)
+            if tap_key is not None:
+                self._latest_taps[tap_key] = update_id
+            self._seen[update_id] = None
+            if len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+        self.accepted += 1
+        return True
+
+    async def _superseded(self, bot: Bot, update: dict[str, Any]) -> bool:
+        """Answer pagination tap if newer tap on its message is queued"""
+        tap_key = raw_pagination_tap_key(update)
+        if tap_key is None or tap_key not in self._latest_taps:
+            return False
+        if self._latest_taps[tap_key] == update.get("update_id"):
+            del self._latest_taps[tap_key]
+            return False
+        callback_coalescer.queue_coalesced += 1
+        try:
+            await bot.answer_callback_query(update["callback_query"]["id"])
+        except TelegramAPIError as e:
+            logger.warning(f"Superseded callback query is not answered: {e}")
+        return True
+
+    async def _process(self, bot: Bot, dispatcher: Dispatcher, update: dict[str, Any]):
+        if await self._superseded(bot, update):
+            return
+        self.in_flight += 1
+        try:
+            result = await dispatcher.feed_raw_update(bot, update)
+            if isinstance(result, TelegramMethod):
+                await dispatcher.silent_call_request(bot, result)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.exception(e)
+        finally:
+            self.in_flight -= 1
+
+    async def _run(self, bot: Bot, dispatcher: Dispatcher, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self._process(bot, dispatcher, update)
+            finally:
+                queue.task_done()
+
+    async def start(self, bot: Bot, dispatcher: Dispatcher):
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(self.shard_queue_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._run(bot, dispatcher, queue)) for queue in self._queues
+        ]
+
+    async def stop(self, timeout: float = 10):
+        """Finish queued updates in `timeout` seconds, then cancel the rest"""
+        if not self._tasks:
+            return
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.gather(*(queue.join() for queue in self._queues))
+        except TimeoutError:
+            logger.warning(f"{self.queued()} webhook updates left unprocessed on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def queued(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "queued": self.queued(),
+            "max_shard_queued": max((queue.qsize() for queue in self._queues), default=0),
+            "shard_queue_size": self.shard_queue_size,
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "shed": self.shed,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+update_ingestor = UpdateIngestor(
+    enabled=os.getenv("BOT_WEBHOOK_ASYNC", "false").lower() == "true",
+    workers=int(os.getenv("BOT_WEBHOOK_WORKERS", 16)),
+    queue_size=int(os.getenv("BOT_WEBHOOK_QUEUE_SIZE", 1000)),
+)
@@ -12,7 +12,10 @@ from aiohttp import MultipartWriter
 from loguru import logger
 
 import app
-from app import handlers
+from app import handlers, middlewares
+from app.activity import activity_tracker
+from app.ingestion import update_ingestor
+from app.webhook_reply import WEBHOOK_REPLY_ENABLED, start_webhook_reply, webhook_reply_stats
 
 
 class MockClass:
@@ -47,6 +50,7 @@ def _build_response_writer(
     payload = writer.append(result.__api_method__)
     payload.set_content_disposition("form-data", name="method")
 
+    bot = app.bot_instance
     files: dict[str, InputFile] = {}
     for key, value in result.model_dump(warnings=False).items():
         value = bot.session.prepare_value(value, bot=bot, files=files)
@@ -68,10 +72,28 @@ def _build_response_writer(
 async def handle_webhook(request: Request) -> Response:
     if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != BOT_ID:
         raise HTTPException(401)
-    result = await app.dispatcher_instance.feed_webhook_update(
-        app.bot_instance,
-        app.bot_instance.session.json_loads(await request.body())
-    )
+    if update_ingestor.enabled:
+        # Telegram delivers refused update again later
+        if not update_ingestor.submit(app.bot_instance.session.json_loads(await request.body())):
+            raise HTTPException(503)
+        return Response()
+    reply = start_webhook_reply() if WEBHOOK_REPLY_ENABLED else None
+    try:
+        result = await app.dispatcher_instance.feed_webhook_update(
+            app.bot_instance,
+            app.bot_instance.session.json_loads(await request.body())
+        )
+    except Exception:
+        # Failed update still delivers what it has sent
+        if reply is not None and (captured := reply.close()) is not None:
+            await app.bot_instance(captured)
+        raise
+    if reply is not None and (captured := reply.close()) is not None:
+        if result is None:
+            result = captured
+            webhook_reply_stats.replied += 1
+        else:
+            await app.bot_instance(captured)
     writer = _build_response_writer(result)
     response = Response(
         content=writer._value,
@@ -81,18 +103,37 @@ async def handle_webhook(request: Request) -> Response:
     return response
 
 
-async def dispatcher_startup():
+webhook_set = False
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _set_webhook():
+    global webhook_set
     try:
         await app.bot_instance.set_webhook(
             url=BOT_WEBHOOK_URL.rstrip('/') + BOT_WEBHOOK_PATH,
             secret_token=BOT_ID
         )
+        webhook_set = True
     except Exception as e:
         logger.error(e)
     finally:
         logger.info("Bot started")
 
 
+def _spawn(coroutine) -> asyncio.Task:
+    """Run coroutine in background, keeping reference to its task until it's done"""
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def dispatcher_startup():
+    # Telegram API call doesn't delay application startup
+    _spawn(_set_webhook())
+
+
 def _setup_dispatcher(dispatcher: Dispatcher):
     dispatcher.include_routers(handlers.start.router)
     dispatcher.include_routers(handlers.tracking.router)
@@ -102,21 +143,42 @@ def _setup_dispatcher(dispatcher: Dispatcher):
     dispatcher.include_routers(handlers.tracking_following.router)
     dispatcher.include_routers(handlers.support.router)
     handlers.error.setup_error_handlers(dispatcher)
+    dispatcher.update.outer_middleware(middlewares.deadline.DeadlineMiddleware())
+    dispatcher.update.outer_middleware(middlewares.activity.ActivityMiddleware())
+    dispatcher.callback_query.outer_middleware(middlewares.coalesce.CallbackCoalesceMiddleware())
+    webhook_reply_flag_middleware = middlewares.webhook_reply.WebhookReplyFlagMiddleware()
+    for router in dispatcher.chain_tail:
+        router.message.middleware(webhook_reply_flag_middleware)
+        router.callback_query.middleware(webhook_reply_flag_middleware)
+    dispatcher.startup.register(activity_tracker.start)
+    dispatcher.shutdown.register(activity_tracker.stop)
     setup_di(dispatcher)
 
 
-def setup_bot(application: FastAPI):
+def setup_bot(application: FastAPI, receive_updates: bool = True):
+    """
+    Create bot and dispatcher. Without receive_updates process doesn't take Telegram updates
+    (neither webhook route nor polling) and uses bot only to send messages
+    """
     if not BOT_TOKEN:
         return
     bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(middlewares.send_queue.SendQueueMiddleware())
     dispatcher = Dispatcher()
     _setup_dispatcher(dispatcher)
 
     app.bot_instance = bot
     app.dispatcher_instance = dispatcher
 
-    if BOT_WEBHOOK_URL:
-        dispatcher.startup.register(dispatcher_startup)
+    if BOT_WEBHOOK_URL or not receive_updates:
+        if receive_updates:
+            dispatcher.startup.register(dispatcher_startup)
+            if update_ingestor.enabled:
+                async def start_update_ingestor() -> None:
+                    await update_ingestor.start(bot, dispatcher)
+
+                dispatcher.startup.register(start_update_ingestor)
+                dispatcher.shutdown.register(update_ingestor.stop)
 
         async def on_startup() -> None:
             await dispatcher.emit_startup(
@@ -124,22 +186,27 @@ def setup_bot(application: FastAPI):
             )
 
         async def on_shutdown() -> None:
-            await bot.session.close()
-            await dispatcher.emit_startup(
+            # Queued updates are finished before bot session is closed
+            await dispatcher.emit_shutdown(
                 application=application, dispatcher=dispatcher, **dispatcher.workflow_data
             )
+            await bot.session.close()
 
-        application.add_route(
-            path=BOT_WEBHOOK_PATH, route=handle_webhook, methods=["POST"]
-        )
-        logger.info("Bot webhook route added")
+        if receive_updates:
+            # Updates processed in background have no webhook response to reply in
+            if WEBHOOK_REPLY_ENABLED and not update_ingestor.enabled:
+                bot.session.middleware(middlewares.webhook_reply.WebhookReplyRequestMiddleware())
+            application.add_route(
+                path=BOT_WEBHOOK_PATH, route=handle_webhook, methods=["POST"]
+            )
+            logger.info("Bot webhook route added")
     else:
         def on_startup():
-            asyncio.create_task(bot.delete_webhook())
-            asyncio.create_task(dispatcher.start_polling(bot))
+            _spawn(bot.delete_webhook())
+            _spawn(dispatcher.start_polling(bot))
 
         def on_shutdown():
-            asyncio.create_task(dispatcher.stop_polling())
+            _spawn(dispatcher.stop_polling())
 
     logger.info("Bot setup finished")
     return on_startup, on_shutdown
@@ -148,6 +215,7 @@ def setup_bot(application: FastAPI):
 async def run_polling():
     global bot, dispatcher
     bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(middlewares.send_queue.SendQueueMiddleware())
     dispatcher = Dispatcher()
     app.bot_instance = bot
     app.dispatcher_instance = dispatcher
@@ -155,7 +223,7 @@ async def run_polling():
 
     await bot.delete_webhook()
     logger.info("Bot started")
-    await dispatcher.start_infinity_polling(bot)
+    await dispatcher.start_polling(bot)
 
 
 def run_migrations():
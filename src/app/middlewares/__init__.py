@@ -0,0 +1,5 @@
+from . import deadline
+from . import activity
+from . import send_queue
+from . import webhook_reply
+from . import coalesce
@@ -0,0 +1,21 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+from app.activity import activity_tracker
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Remember when user interacted with bot, for activity-aware report scheduling"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is not None:
+            activity_tracker.touch(user.id)
+        return await handler(event, data)
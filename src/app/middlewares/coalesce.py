@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery
+
+from app.coalesce import callback_coalescer, pagination_tap_key
+
+
+class CallbackCoalesceMiddleware(BaseMiddleware):
+    """
+    Process only the latest of rapid pagination taps on a message.
+    Superseded taps are answered at once, so they make neither upstream requests nor edits
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: dict[str, Any],
+    ) -> Any:
+        key = pagination_tap_key(event)
+        if key is None:
+            return await handler(event, data)
+        if not await callback_coalescer.wait_turn(key):
+            try:
+                await event.answer()
+            except TelegramBadRequest:
+                pass
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            callback_coalescer.done(key)
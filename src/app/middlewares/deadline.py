@@ -0,0 +1,32 @@
+from typing import Any, Awaitable, Callable
+import os
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.deadline import deadline, remaining
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    """
+    Give every update a time budget, so slow upstream can't hold handler and its DB session.
+    Update which already has budget (e.g. fed by report webhook) keeps it
+    """
+
+    budgets = {
+        "callback_query": float(os.getenv("CALLBACK_QUERY_BUDGET", 10)),
+        "message": float(os.getenv("MESSAGE_BUDGET", 20)),
+    }
+    default_budget = float(os.getenv("UPDATE_BUDGET", 20))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        budget = remaining()
+        if budget is None:
+            budget = self.budgets.get(event.event_type, self.default_budget)
+        async with deadline(budget):
+            return await handler(event, data)
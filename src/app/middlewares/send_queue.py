@@ -0,0 +1,61 @@
+from typing import TYPE_CHECKING, Any
+import os
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from loguru import logger
+
+from app.deadline import remaining
+from app.send_queue import send_scheduler
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """
+    Pass messages sent to chats through send_scheduler and repeat requests to chats
+    after Telegram flood wait. Telegram limits sent messages, so other requests
+    (edits, deletes, chat actions, answerCallbackQuery) aren't limited
+    """
+
+    max_retries = int(os.getenv("TELEGRAM_RETRY_AFTER_RETRIES", 3))
+    unlimited_send_methods = {"sendChatAction"}
+    limited_methods = {"copyMessage", "copyMessages", "forwardMessage", "forwardMessages"}
+
+    @classmethod
+    def is_limited(cls, method: TelegramMethod) -> bool:
+        name = method.__api_method__
+        if name in cls.unlimited_send_methods:
+            return False
+        return name.startswith("send") or name in cls.limited_methods
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id: Any = getattr(method, "chat_id", None)
+        if not isinstance(chat_id, int):
+            return await make_request(bot, method)
+        limited = self.is_limited(method)
+        attempt = 0
+        while True:
+            # Retry waits out the flood wait pause of the chat
+            if limited or attempt:
+                await send_scheduler.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                send_scheduler.pause_chat(chat_id, e.retry_after)
+                budget = remaining()
+                if attempt >= self.max_retries or (budget is not None and budget < e.retry_after):
+                    raise
+                attempt += 1
+                logger.warning(f"Telegram asked to retry {method.__api_method__} to {chat_id} after {e.retry_after}s")
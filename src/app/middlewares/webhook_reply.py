@@ -0,0 +1,56 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.dispatcher.flags import get_flag
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+
+from app.webhook_reply import current_webhook_reply, webhook_reply_stats
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class WebhookReplyRequestMiddleware(BaseRequestMiddleware):
+    """
+    Keep first request of webhook update for webhook response, handler gets None as its result.
+    Kept request is sent before the next one, if handler makes it
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        reply = current_webhook_reply()
+        if reply is None:
+            return await make_request(bot, method)
+        if reply.capture(method):
+            return None
+        captured = reply.take()
+        if captured is not None:
+            webhook_reply_stats.flushed += 1
+            await make_request(bot, captured)
+        return await make_request(bot, method)
+
+
+class WebhookReplyFlagMiddleware(BaseMiddleware):
+    """Disable webhook reply for handlers flagged with needs_message_id"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        reply = current_webhook_reply()
+        if reply is not None and get_flag(data, "needs_message_id"):
+            reply.enabled = False
+            webhook_reply_stats.disabled += 1
+        return await handler(event, data)
@@ -0,0 +1,135 @@
+from collections import deque
+import asyncio
+import datetime as dt
+import time
+
+
+class TokenBucket:
+    """Allow `rate` operations per second on average and bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def drain(self, seconds: float):
+        """Take every token and `seconds` of refill ahead"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def delay(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available"""
+        self._refill()
+        return max(tokens - self.tokens, 0) / self.rate
+
+    async def acquire(self, tokens: float = 1):
+        while not self.try_acquire(tokens):
+            delay = self.delay(tokens)
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "waited_seconds": round(self.waited, 2),
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit of concurrent calls to upstream.
+    Limit grows by one per `limit` healthy calls and halves on overload
+    or when latency rises above tolerance * smoothed latency
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        latency_tolerance: float = 2,
+        smoothing: float = 0.1,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.latency: float | None = None
+        self.decreases = 0
+        self._decreased_at = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            self._adjust(latency, overloaded)
+            self._condition.notify_all()
+
+    def _adjust(self, latency: float, overloaded: bool):
+        slow = self.latency is not None and latency > self.latency * self.latency_tolerance
+        self.latency = (
+            latency
+            if self.latency is None
+            else self.latency * (1 - self.smoothing) + latency * self.smoothing
+        )
+        if not overloaded and not slow:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            return
+        # Calls which were in flight together fail together, decrease once for them
+        now = time.monotonic()
+        if now - self._decreased_at > self.latency:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._decreased_at = now
+            self.decreases += 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "decreases": self.decreases,
+        }
+
+
+class PerMinuteCounter:
+    """Count events per wall clock minute for the last `minutes` minutes"""
+
+    def __init__(self, minutes: int = 60):
+        self._counts: deque[list[int]] = deque(maxlen=minutes)
+
+    def add(self, count: int = 1):
+        minute = int(time.time() // 60)
+        if self._counts and self._counts[-1][0] == minute:
+            self._counts[-1][1] += count
+        else:
+            self._counts.append([minute, count])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            dt.datetime.fromtimestamp(minute * 60, dt.UTC).strftime("%Y-%m-%d %H:%M"): count
+            for minute, count in self._counts
+        }
@@ -0,0 +1,233 @@
+from collections import deque
+from enum import Enum
+from functools import wraps
+import asyncio
+import datetime as dt
+import os
+import random
+import time
+
+from aiohttp import ClientError
+from loguru import logger
+
+from app.deadline import DeadlineExceeded, remaining
+from app.schemas.exception import ApiException, UpstreamUnavailableException
+
+
+class CircuitState(Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures.
+    After recovery_timeout one probe request is allowed (half open),
+    its success closes the circuit and its failure opens it again
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CircuitState.closed
+        self.failures = 0
+        self.opened_at = 0.0
+        self.transitions = 0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == CircuitState.closed:
+            return True
+        if self.state == CircuitState.open:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self._set_state(CircuitState.half_open)
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Call was cancelled, so it tells nothing about upstream"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != CircuitState.closed:
+            self._set_state(CircuitState.closed)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == CircuitState.half_open or (
+            self.state == CircuitState.closed and self.failures >= self.failure_threshold
+        ):
+            self.opened_at = time.monotonic()
+            self._set_state(CircuitState.open)
+
+    def _set_state(self, state: CircuitState):
+        previous_state, self.state = self.state, state
+        self.transitions += 1
+        logger.warning(f"Circuit {self.name}: {previous_state.value} -> {state.value}")
+        recent_transitions.append(
+            {
+                "at": dt.datetime.now(dt.UTC).isoformat(),
+                "circuit": self.name,
+                "from": previous_state.value,
+                "to": state.value,
+            }
+        )
+        for listener in state_change_listeners:
+            _spawn(listener(self, previous_state))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "transitions": self.transitions,
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket for retries: every request deposits `ratio` token, every retry withdraws one.
+    So retries never exceed ratio of traffic (plus min_per_second) and don't amplify load during outage
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1, max_tokens: float = 10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated_at = time.monotonic()
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self, amount: float = 0):
+        now = time.monotonic()
+        self.tokens = min(
+            self.max_tokens,
+            self.tokens + (now - self.updated_at) * self.min_per_second + amount,
+        )
+        self.updated_at = now
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+state_change_listeners = []
+recent_transitions: deque[dict] = deque(maxlen=50)
+circuit_breakers: dict[str, CircuitBreaker] = {}
+retry_budget = RetryBudget(
+    ratio=float(os.getenv("INSTAGRAM_RETRY_BUDGET_RATIO", 0.1)),
+    min_per_second=float(os.getenv("INSTAGRAM_RETRY_BUDGET_MIN_PER_SECOND", 1)),
+)
+_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coroutine):
+    task = asyncio.create_task(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    if name not in circuit_breakers:
+        circuit_breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("INSTAGRAM_CIRCUIT_FAILURE_THRESHOLD", 5)),
+            recovery_timeout=float(os.getenv("INSTAGRAM_CIRCUIT_RECOVERY_TIMEOUT", 30)),
+        )
+    return circuit_breakers[name]
+
+
+def is_circuit_open(name: str) -> bool:
+    """Upstream method is failing: its circuit is open or probing recovery"""
+    breaker = circuit_breakers.get(name)
+    return breaker is not None and breaker.state != CircuitState.closed
+
+
+def is_upstream_failure(exc: Exception) -> bool:
+    """Network errors, timeouts, 429 and 5xx. Other statuses are valid upstream answers"""
+    if isinstance(exc, ApiException):
+        return exc.status is None or exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (ClientError, TimeoutError))
+
+
+def circuit_breaker(max_retries: int = 2, backoff: float = 0.2):
+    """
+    Guard idempotent repository call with per-method circuit breaker
+    and jittered retries limited by global retry budget.
+    Raise UpstreamUnavailableException if circuit is open or upstream keeps failing
+    """
+
+    def decorator(func):
+        breaker = get_circuit_breaker(func.__name__)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not breaker.allow_request():
+                raise UpstreamUnavailableException(f"Circuit {breaker.name} is open")
+            retry_budget.deposit()
+            attempt = 0
+            while True:
+                try:
+                    result = await func(*args, **kwargs)
+                except (asyncio.CancelledError, DeadlineExceeded):
+                    # Caller gave up, it tells nothing about upstream and must not be retried
+                    breaker.release_probe()
+                    raise
+                except Exception as e:
+                    if not is_upstream_failure(e):
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    if (
+                        attempt >= max_retries
+                        or breaker.state != CircuitState.closed
+                        or not retry_budget.try_withdraw()
+                    ):
+                        message = e.message if isinstance(e, ApiException) else repr(e)
+                        raise UpstreamUnavailableException(
+                            message, getattr(e, "status", None)
+                        ) from e
+                    attempt += 1
+                    delay = random.uniform(0, backoff * 2**attempt)
+                    budget = remaining()
+                    if budget is not None and budget <= delay:
+                        raise DeadlineExceeded("No budget left for retry") from e
+                    await asyncio.sleep(delay)
+                    continue
+                breaker.record_success()
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def circuit_breakers_stats() -> dict:
+    return {
+        "circuits": {name: breaker.stats() for name, breaker in circuit_breakers.items()},
+        "recent_transitions": list(recent_transitions),
+        "retry_budget": retry_budget.stats(),
+    }
@@ -0,0 +1,304 @@
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+import asyncio
+import inspect
+import os
+import time
+
+from loguru import logger
+from pydantic import BaseModel
+
+from app.repositories.breaker import is_circuit_open
+from app.schemas.exception import UpstreamUnavailableException
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    :param ttl: seconds while entry is fresh
+    :param stale_ttl: seconds after ttl while entry is still served and refreshed in background
+    """
+    ttl: float
+    stale_ttl: float = 0
+
+
+def call_key(signature: inspect.Signature, name: str, args: tuple, kwargs: dict) -> tuple:
+    """Build key from bound arguments, so f(x) and f(x, days=7) share one key. First argument (self) is skipped"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return (name, *list(bound.arguments.values())[1:])
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._refreshing: set[tuple] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.fallbacks = 0  # Expired entries served while upstream is unavailable
+
+    def get(self, key: tuple) -> tuple[object, float] | None:
+        """Return value and its age in seconds"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        stored_at, value = entry
+        return value, time.monotonic() - stored_at
+
+    def set(self, key: tuple, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_fresh(self, method, *args, **kwargs):
+        """Result of @cached repository method call if it's cached and fresh, else None"""
+        entry = self.get(method.cache_key(method.__self__, *args, **kwargs))
+        if entry is None or entry[1] >= method.cache_policy.ttl:
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set_result(self, method, value, *args, **kwargs):
+        """Store result of @cached repository method call got in another way, e.g. bulk request"""
+        if is_cacheable(value):
+            self.set(method.cache_key(method.__self__, *args, **kwargs), value)
+
+    def invalidate(self, username: str):
+        """Drop every entry which was requested for username"""
+        keys = [key for key in self._entries if len(key) > 1 and key[1] == username]
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+
+    def refresh_in_background(self, key: tuple, coroutine_factory):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, coroutine_factory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: tuple, coroutine_factory):
+        try:
+            value = await coroutine_factory()
+            if is_cacheable(value):
+                self.set(key, value)
+            self.refreshes += 1
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {e!r}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def is_cacheable(value) -> bool:
+    """Not found (None) and error texts (str) are not cached"""
+    return value is not None and not isinstance(value, str)
+
+
+def mark_stale(value):
+    """Return copy of cached schema flagged as stale, cached object itself is shared"""
+    if isinstance(value, BaseModel):
+        value = value.model_copy()
+        value._stale = True
+    return value
+
+
+class PackedStrings:
+    """Immutable list of strings stored as one utf-8 buffer and offsets array"""
+
+    def __init__(self, strings: list[str]):
+        encoded = [string.encode() for string in strings]
+        self._buffer = b"".join(encoded)
+        self._offsets = array("I", [0])
+        for item in encoded:
+            self._offsets.append(self._offsets[-1] + len(item))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def slice(self, start: int, stop: int) -> list[str]:
+        stop = min(stop, len(self))
+        offsets = self._offsets
+        return [
+            self._buffer[offsets[i] : offsets[i + 1]].decode() for i in range(start, stop)
+        ]
+
+    def page(self, page: int, on_page_count: int) -> list[str]:
+        """Page numbers start with 1"""
+        start = (page - 1) * on_page_count
+        return self.slice(max(start, 0), start + on_page_count)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer) + self._offsets.itemsize * len(self._offsets)
+
+
+class ReportDiffCache:
+    """
+    LRU of report differences limited by size in bytes.
+    Report difference never changes once created, so entries are never refreshed
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: OrderedDict[tuple[int, str], dict[str, PackedStrings]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(value: dict[str, PackedStrings]) -> int:
+        return sum(strings.nbytes for strings in value.values())
+
+    def get(self, key: tuple[int, str]) -> dict[str, PackedStrings] | None:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: tuple[int, str], value: dict[str, PackedStrings]):
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.nbytes -= self._size(self._entries.pop(key))
+        self._entries[key] = value
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= self._size(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class PagedViewCache:
+    """
+    Short-lived pre-rendered lines of live list views, keyed by (username, view).
+    Page flips are served from here without upstream calls and rendering
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[float, PackedStrings]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[str, str]) -> PackedStrings | None:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: tuple[str, str], lines: PackedStrings):
+        self._entries[key] = (time.monotonic(), lines)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        for key in [key for key in self._entries if key[0] == username]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(lines.nbytes for _, lines in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache()
+paged_view_cache = PagedViewCache(
+    ttl=int(os.getenv("PAGED_VIEW_CACHE_TTL", 120)),
+    max_entries=int(os.getenv("PAGED_VIEW_CACHE_MAX_ENTRIES", 1000)),
+)
+report_diff_cache = ReportDiffCache(
+    max_bytes=int(os.getenv("REPORT_DIFF_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+)
+
+
+def cached(policy: CachePolicy):
+    """Cache repository method result. Repository must have `cache` attribute"""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            cache: ResponseCache = self.cache
+            key = call_key(signature, func.__name__, (self, *args), kwargs)
+            entry = cache.get(key)
+            if entry is not None:
+                value, age = entry
+                if age < policy.ttl:
+                    cache.hits += 1
+                    return value
+                if age < policy.ttl + policy.stale_ttl:
+                    cache.stale_hits += 1
+                    cache.refresh_in_background(key, lambda: func(self, *args, **kwargs))
+                    # Refresh can't succeed while upstream is down, so entry stays old
+                    if is_circuit_open(func.__name__):
+                        return mark_stale(value)
+                    return value
+
+            cache.misses += 1
+            try:
+                value = await func(self, *args, **kwargs)
+            except UpstreamUnavailableException:
+                if entry is None:
+                    raise
+                cache.fallbacks += 1
+                return mark_stale(entry[0])
+            if is_cacheable(value):
+                cache.set(key, value)
+            return value
+
+        # Used by ResponseCache.get_fresh and set_result
+        wrapper.cache_key = lambda self, *args, **kwargs: call_key(
+            signature, func.__name__, (self, *args), kwargs
+        )
+        wrapper.cache_policy = policy
+        return wrapper
+
+    return decorator
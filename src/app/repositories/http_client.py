@@ -0,0 +1,136 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import os
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout, TCPConnector
+from loguru import logger
+
+from app.deadline import DeadlineExceeded, remaining
+
+
+class HttpClient:
+    """
+    Pooled keep-alive client for one upstream.
+    Session is created lazily, so client works outside of FastAPI lifespan too (polling mode)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str | None,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30,
+        timeout: float = 30,
+        headers: dict | None = None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.headers = headers
+        self._session: ClientSession | None = None
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_count = 0
+        self.saturated_count = 0  # Requests which waited for a free connection
+        self.deadline_exceeded_count = 0
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = ClientSession(
+                base_url=self.base_url, connector=connector, headers=self.headers
+            )
+            logger.debug(f"Opened {self.name} connection pool ({self.limit=}, {self.limit_per_host=})")
+        return self._session
+
+    async def open(self):
+        self.session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug(f"Closed {self.name} connection pool")
+        self._session = None
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator[ClientResponse]:
+        """Request is limited by client timeout and by remaining budget of current update"""
+        budget = remaining()
+        if budget is not None and budget <= 0:
+            self.deadline_exceeded_count += 1
+            raise DeadlineExceeded(f"No budget left for {method} {url}")
+        limited_by_budget = budget is not None and budget < self.timeout
+        kwargs.setdefault(
+            "timeout", ClientTimeout(total=budget if limited_by_budget else self.timeout)
+        )
+        self.requests_count += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if self.limit and self.in_flight > self.limit:
+            self.saturated_count += 1
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                yield resp
+        except TimeoutError as e:
+            if not limited_by_budget or isinstance(e, DeadlineExceeded):
+                raise
+            self.deadline_exceeded_count += 1
+            raise DeadlineExceeded(f"Budget exceeded by {method} {url}") from e
+        finally:
+            self.in_flight -= 1
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests_count,
+            "saturated": self.saturated_count,
+            "deadline_exceeded": self.deadline_exceeded_count,
+            "utilization": round(self.in_flight / self.limit, 3) if self.limit else None,
+        }
+
+
+instagram_api_client = HttpClient(
+    "instagram_api",
+    os.getenv("INSTAGRAM_API_URL"),
+    limit=int(os.getenv("INSTAGRAM_API_POOL_LIMIT", 100)),
+    limit_per_host=int(os.getenv("INSTAGRAM_API_POOL_LIMIT_PER_HOST", 0)),
+    timeout=float(os.getenv("INSTAGRAM_API_TIMEOUT", 30)),
+)
+cloudpayments_api_client = HttpClient(
+    "cloudpayments_api",
+    "https://api.cloudpayments.ru",
+    limit=int(os.getenv("CLOUDPAYMENTS_API_POOL_LIMIT", 10)),
+    timeout=float(os.getenv("CLOUDPAYMENTS_API_TIMEOUT", 15)),
+    headers={"Content-Type": "application/json"},
+)
+http_clients = [instagram_api_client, cloudpayments_api_client]
+
+
+async def open_http_clients():
+    for client in http_clients:
+        await client.open()
+
+
+async def close_http_clients():
+    for client in http_clients:
+        await client.close()
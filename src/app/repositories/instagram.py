@@ -1,8 +1,20 @@
-from aiohttp import ClientSession
 from loguru import logger
+import asyncio
 import os
+import time
 
-from app.schemas.exception import ApiException
+from app.repositories.breaker import circuit_breaker
+from app.repositories.cache import (
+    CachePolicy,
+    PackedStrings,
+    cached,
+    paged_view_cache,
+    report_diff_cache,
+    response_cache,
+)
+from app.repositories.http_client import instagram_api_client
+from app.repositories.singleflight import single_flight, single_flight_group
+from app.schemas.exception import ApiException, UpstreamUnavailableException
 
 from app.schemas.instagram import (
     InstagramMediaListSchema,
@@ -19,198 +31,339 @@ from app.schemas.instagram import (
 
 
 class InstagramRepository:
-    API_URL = os.getenv("INSTAGRAM_API_URL")
+    client = instagram_api_client
+    cache = response_cache
+    report_diff_cache = report_diff_cache
+    paged_view_cache = paged_view_cache
+    single_flight = single_flight_group
+
+    user_cache_policy = CachePolicy(
+        ttl=int(os.getenv("INSTAGRAM_USER_CACHE_TTL", 300)),
+        stale_ttl=int(os.getenv("INSTAGRAM_USER_CACHE_STALE_TTL", 3600)),
+    )
+    media_stats_cache_policy = CachePolicy(
+        ttl=int(os.getenv("INSTAGRAM_MEDIA_STATS_CACHE_TTL", 1800)),
+        stale_ttl=int(os.getenv("INSTAGRAM_MEDIA_STATS_CACHE_STALE_TTL", 6 * 3600)),
+    )
+
+    bulk_chunk_size = int(os.getenv("INSTAGRAM_BULK_CHUNK_SIZE", 50))
+    bulk_fallback_concurrency = int(os.getenv("INSTAGRAM_BULK_FALLBACK_CONCURRENCY", 10))
+    # Bulk route is probed again after this many seconds once upstream refused it
+    bulk_route_retry_after = int(os.getenv("INSTAGRAM_BULK_ROUTE_RETRY_AFTER", 3600))
+    _bulk_route_unsupported_until = 0.0
+
+    @classmethod
+    def invalidate_user_cache(cls, username: str):
+        """Drop cached responses of username, e.g. when new report is ready"""
+        cls.cache.invalidate(username)
+        cls.paged_view_cache.invalidate(username)
 
     async def start_user_tracking(self, username: str) -> InstagramUserSchema | str:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.post("/api/user", json={"instagram_username": username})
+        async with self.client.post("/api/user", json={"instagram_username": username}) as resp:
             if resp.status in (200, 201):
                 return InstagramUserSchema.model_validate(await resp.json())
             elif resp.status == 404:
                 return "Профиль не найден"
             elif resp.status == 400:
                 return (await resp.json())["detail"]
-            raise ApiException(await resp.text())
+            raise ApiException(await resp.text(), resp.status)
 
+    @cached(user_cache_policy)
+    @single_flight
+    @circuit_breaker()
     async def get_user_info(self, username: str) -> InstagramUserSchema | None:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get("/api/user", params={"username": username})
+        async with self.client.get("/api/user", params={"username": username}) as resp:
             if resp.status in (200, 201):
                 body = await resp.json()
                 return InstagramUserSchema.model_validate(body)
             elif resp.status == 404:
                 return None
-            raise ApiException(await resp.text())
+            raise ApiException(await resp.text(), resp.status)
+
+    async def get_users_info_bulk(
+        self, usernames: list[str]
+    ) -> dict[str, InstagramUserSchema | None]:
+        """
+        Return profile info for every username, None for not found.
+        Fresh cached profiles are reused, the rest are requested in chunks
+        or, if upstream has no bulk route or refuses bulk request,
+        with bounded parallel single requests
+        """
+        result: dict[str, InstagramUserSchema | None] = {}
+        missing = []
+        for username in dict.fromkeys(usernames):
+            info = self.cache.get_fresh(self.get_user_info, username)
+            if info is not None:
+                result[username] = info
+            else:
+                missing.append(username)
+        if not missing:
+            return result
+
+        chunks = [
+            missing[i : i + self.bulk_chunk_size]
+            for i in range(0, len(missing), self.bulk_chunk_size)
+        ]
+        if time.monotonic() >= InstagramRepository._bulk_route_unsupported_until:
+            for chunk in chunks:
+                try:
+                    infos = await self._get_users_info_chunk(chunk)
+                except UpstreamUnavailableException:
+                    infos = None  # Single requests may still be served from cache
+                except ApiException as e:
+                    logger.warning(f"Bulk user request failed ({e.status}), falling back to single requests")
+                    infos = None
+                if infos is None:
+                    break
+                result |= infos
+            else:
+                return result
+
+        semaphore = asyncio.Semaphore(self.bulk_fallback_concurrency)
+
+        async def get_user_info(username: str):
+            async with semaphore:
+                try:
+                    result[username] = await self.get_user_info(username)
+                except ApiException as e:
+                    # Report is built without profile info rather than not at all
+                    logger.warning(f"User info of {username} is not loaded: {e.message}")
+                    result[username] = None
+
+        await asyncio.gather(*[get_user_info(u) for u in missing if u not in result])
+        return result
+
+    @circuit_breaker()
+    async def _get_users_info_chunk(
+        self, usernames: list[str]
+    ) -> dict[str, InstagramUserSchema | None] | None:
+        """Return None if upstream has no bulk route, it's not requested again for a while"""
+        async with self.client.get(
+            "/api/user/bulk", params=[("username", username) for username in usernames]
+        ) as resp:
+            if resp.status in (404, 405):
+                InstagramRepository._bulk_route_unsupported_until = (
+                    time.monotonic() + self.bulk_route_retry_after
+                )
+                logger.info("Instagram API has no bulk user route, falling back to single requests")
+                return None
+            if resp.status != 200:
+                raise ApiException(await resp.text(), resp.status)
+            body = await resp.json()
 
+        infos = {username: None for username in usernames}
+        for item in body:
+            schema = InstagramUserSchema.model_validate(item)
+            infos[schema.username] = schema
+            self.cache.set_result(self.get_user_info, schema, schema.username)
+        return infos
+
+    @single_flight
+    @circuit_breaker()
     async def get_user_reports(self, username: str, count: int = 10, page: int = 0) -> list[InstagramUserReportSchema]:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get("/api/report/user/" + username, params={"count": count, "page": page})
+        async with self.client.get("/api/report/user/" + username, params={"count": count, "page": page}) as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return [
             InstagramUserReportSchema.model_validate(i)
             for i in body
         ]
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_followers_difference(
         self, username: str
     ) -> list[InstagramUserFollowersDifferenceSchema]:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/followers")
+        async with self.client.get(f"/api/user/{username}/followers") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return [InstagramUserFollowersDifferenceSchema.model_validate(i) for i in body]
 
+    async def get_report_difference_usernames(
+        self, report_id: int, kind: str
+    ) -> dict[str, PackedStrings]:
+        """
+        Return subscribes_usernames and unsubscribes_usernames of report difference,
+        kind is "followers" or "following". Difference is downloaded once per report
+        """
+        key = (report_id, kind)
+        usernames = self.report_diff_cache.get(key)
+        if usernames is not None:
+            return usernames
+        if kind == "followers":
+            diff = await self.get_report_followers_difference(report_id)
+        else:
+            diff = await self.get_report_followings_difference(report_id)
+        usernames = {
+            "subscribes_usernames": PackedStrings(diff.subscribes_usernames),
+            "unsubscribes_usernames": PackedStrings(diff.unsubscribes_usernames),
+        }
+        self.report_diff_cache.set(key, usernames)
+        return usernames
+
+    @single_flight
+    @circuit_breaker()
     async def get_report_followers_difference(self, report_id: int) -> InstagramUserFollowersDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/follower/report/{report_id}/difference")
+        async with self.client.get(f"/api/follower/report/{report_id}/difference") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowersDifferenceSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_report_followings_difference(self, report_id: int) -> InstagramUserFollowingDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/following/report/{report_id}/difference")
+        async with self.client.get(f"/api/following/report/{report_id}/difference") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowingDifferenceSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_following_difference(
         self, username: str
     ) -> list[InstagramUserFollowingDifferenceSchema]:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/following")
+        async with self.client.get(f"/api/user/{username}/following") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return [InstagramUserFollowingDifferenceSchema.model_validate(i) for i in body]
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_followers_following_difference(self, username: str) -> InstagramUserFollowDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/followers/following")
+        async with self.client.get(f"/api/user/{username}/followers/following") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowDifferenceSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_following_followers_difference(self, username: str) -> InstagramUserFollowDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/following/followers")
+        async with self.client.get(f"/api/user/{username}/following/followers") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowDifferenceSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_following_followers_collision(self, username: str) -> InstagramUserFollowDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/followers_following")
+        async with self.client.get(f"/api/user/{username}/followers_following") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowDifferenceSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_hidden_followers(self, username: str) -> InstagramUserFollowDifferenceSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(f"/api/user/{username}/hidden_followers")
+        async with self.client.get(f"/api/user/{username}/hidden_followers") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserFollowDifferenceSchema.model_validate(body)
 
     async def get_user_followers(self, username: str) -> list[InstagramUserSchema]:
         raise DeprecationWarning("Deprecated function")
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get("/api/user/" + username + "/followers")
+        async with self.client.get("/api/user/" + username + "/followers") as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return [InstagramUserSchema.model_validate(user) for user in body]
 
+    @cached(user_cache_policy)
+    @single_flight
+    @circuit_breaker()
     async def get_user_stats(self, username: str) -> InstagramUserStatsSchema | str:
         """Return schema or error text"""
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(
-                "/api/user/" + username + "/stats", params={"days": 7}
-            )
+        async with self.client.get(
+            "/api/user/" + username + "/stats", params={"days": 7}
+        ) as resp:
             if resp.status == 400:
                 body = await resp.json()
                 return body.get("detail", "Внутреняя ошибка")
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserStatsSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_stats_change_from_real(self, username: str, days: int = 1) -> InstagramUserStatsSchema | str:
         """Return schema or error text"""
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(
-                "/api/user/" + username + "/change", params={"days": days}
-            )
+        async with self.client.get(
+            "/api/user/" + username + "/change", params={"days": days}
+        ) as resp:
             if resp.status == 400:
                 body = await resp.json()
                 return body.get("detail", "Внутреняя ошибка")
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserStatsSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_user_media_info(
             self, username: str, count: int = 12, max_id: str | None = None
     ) -> InstagramMediaListSchema:
         params = {"username": username, "count": count}
         if max_id is not None:
             params["max_id"] = max_id
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get("/api/media", params=params)
+        async with self.client.get("/api/media", params=params) as resp:
             if resp.status not in (200, 201):
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramMediaListSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_media_info(self, media_id: str) -> InstagramMediaSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get("/api/media/" + media_id)
+        async with self.client.get("/api/media/" + media_id) as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramMediaSchema.model_validate(body)
 
+    @single_flight
+    @circuit_breaker()
     async def get_media_stats(
         self, media_id: str, days: int = 7
     ) -> InstagramMediaStatsSchema:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(
-                "/api/media/" + media_id + "/stats", params={"days": days}
-            )
+        async with self.client.get(
+            "/api/media/" + media_id + "/stats", params={"days": days}
+        ) as resp:
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         logger.debug(body)
         return InstagramMediaStatsSchema.model_validate(body)
 
+    @cached(media_stats_cache_policy)
+    @single_flight
+    @circuit_breaker()
     async def get_media_user_stats(
         self, username: str, days: int = 7
     ) -> InstagramMediaUserStatsSchema | str:
-        async with ClientSession(base_url=self.API_URL) as session:
-            resp = await session.get(
-                "/api/media/stats", params={"days": days, "username": username}
-            )
+        async with self.client.get(
+            "/api/media/stats", params={"days": days, "username": username}
+        ) as resp:
             if resp.status == 400:
                 body = await resp.json()
                 return body.get("detail", "Внутреняя ошибка")
             if resp.status != 200:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramMediaUserStatsSchema.model_validate(body)
 
     async def create_user_report(self, telegram_id: int, username: str, force: bool = False) -> InstagramUserReportSchema:
-        async with ClientSession(base_url=os.getenv("INSTAGRAM_API_URL")) as session:
-            resp = await session.post(f"/api/user/{username}/report", json={"webhook_url": f"http://instagrambot_app/api/user/{telegram_id}/report", "force": force})
+        async with self.client.post(f"/api/user/{username}/report", json={"webhook_url": f"http://instagrambot_app/api/user/{telegram_id}/report", "force": force}) as resp:
             if resp.status != 201:
-                raise ApiException(await resp.text())
+                raise ApiException(await resp.text(), resp.status)
             body = await resp.json()
         return InstagramUserReportSchema.model_validate(body)
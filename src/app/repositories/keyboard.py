@@ -17,7 +17,8 @@ from app.schemas.action_callback import (
     TrackingReportCallback,
 )
 from app.schemas.texts import media_display_url_to_emoji
-from db.tables import Tariff, Tracking, TrackingMedia
+from db.read_models import TariffRow
+from db.tables import Tracking, TrackingMedia
 
 BOT_WEBHOOK_URL = os.getenv("BOT_WEBHOOK_URL", "")
 BOT_WEBHOOK_URL = "https://my-followers.online"
@@ -25,6 +26,9 @@ humanize.i18n.activate("RU_ru")
 
 
 class KeyboardRepository:
+    previous_page_text = "⬅️"
+    next_page_text = "➡️"
+
     def build_main_keyboard(self) -> types.ReplyKeyboardMarkup:
         builder = ReplyKeyboardBuilder()
         builder.button(**Action.add_tracking.model_dump())
@@ -133,7 +137,7 @@ class KeyboardRepository:
         return builder.as_markup()
 
     def build_tracking_settings_keyboard(
-        self, username: str, tarrifs: list[Tariff], current_tariff_id: int
+        self, username: str, tarrifs: list[TariffRow], current_tariff_id: int
     ) -> types.InlineKeyboardMarkup:
         builder = InlineKeyboardBuilder()
         for tariff in tarrifs:
@@ -687,7 +691,7 @@ class KeyboardRepository:
         if current_page > 1:
             buttons.append(
                 types.InlineKeyboardButton(
-                    text="⬅️",
+                    text=self.previous_page_text,
                     callback_data=callback_data.replace(
                         **{page_key: current_page - 1}
                     ).pack(),
@@ -701,7 +705,7 @@ class KeyboardRepository:
         if current_page < total_pages:
             buttons.append(
                 types.InlineKeyboardButton(
-                    text="➡️",
+                    text=self.next_page_text,
                     callback_data=callback_data.replace(
                         **{page_key: current_page + 1}
                     ).pack(),
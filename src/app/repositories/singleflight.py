@@ -0,0 +1,54 @@
+from functools import wraps
+import asyncio
+import inspect
+
+from app.repositories.cache import call_key
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one, result is shared by every waiter"""
+
+    def __init__(self):
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+        self.calls = 0
+        self.saved_calls = 0
+
+    async def do(self, key: tuple, coroutine_factory):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.saved_calls += 1
+        else:
+            self.calls += 1
+            task = asyncio.create_task(coroutine_factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # Shield, so cancelled waiter doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved, when every waiter was cancelled
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "saved_calls": self.saved_calls,
+        }
+
+
+single_flight_group = SingleFlight()
+
+
+def single_flight(func):
+    """Coalesce concurrent identical repository calls. Repository must have `single_flight` attribute"""
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        key = call_key(signature, func.__name__, (self, *args), kwargs)
+        return await self.single_flight.do(key, lambda: func(self, *args, **kwargs))
+
+    return wrapper
@@ -1,8 +1,8 @@
-from sqlalchemy import select
+from sqlalchemy import Integer, cast, func, select, update
 import datetime as dt
 
 from app.repositories.base import BaseRepository
-from db.tables import Subscription
+from db.tables import Subscription, Tariff
 
 
 class SubscriptionRepository[Table: Subscription, int](BaseRepository):
@@ -21,6 +21,25 @@ class SubscriptionRepository[Table: Subscription, int](BaseRepository):
         query = self._query_add_select_in_load(query, Subscription.tariff)
         return list(await self.session.scalars(query))
 
+    async def resume_reports(self, telegram_ids: list[int], now: dt.datetime):
+        """Move next report of users back to the nearest slot of their schedule"""
+        interval = cast(Tariff.tracking_report_interval, Integer)
+        ahead = func.extract("epoch", Subscription.next_report_at - now)
+        query = (
+            update(Subscription)
+            .where(
+                Subscription.tariff_id == Tariff.id,
+                Subscription.user_telegram_id.in_(telegram_ids),
+                Subscription.next_report_at > now,
+            )
+            .values(
+                next_report_at=Subscription.next_report_at
+                - func.make_interval(0, 0, 0, 0, 0, 0, func.floor(ahead / interval) * interval)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(query)
+
     async def update(self, model_id: int, **fields) -> Subscription:
         return await self._update(model_id, **fields)
 
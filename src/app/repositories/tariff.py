@@ -1,6 +1,7 @@
 from sqlalchemy import select
 
 from app.repositories.base import BaseRepository
+from db.read_models import TariffRow, select_rows
 from db.tables import Tariff
 
 
@@ -13,6 +14,10 @@ class TariffRepository[Table: Tariff, int](BaseRepository):
     async def list(self, page=None, count=None) -> list[Tariff]:
         return await self._get_list(page=page, count=count)
 
+    async def list_rows(self) -> list[TariffRow]:
+        query = select_rows(TariffRow, Tariff).order_by(Tariff.id)
+        return [TariffRow(*row) for row in await self.session.execute(query)]
+
     async def get(self, model_id: int) -> Tariff:
         return await self._get_one(id=model_id)
 
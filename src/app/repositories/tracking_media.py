@@ -1,6 +1,7 @@
 from sqlalchemy import select
 
 from app.repositories.base import BaseRepository
+from db.read_models import TrackingMediaRef, select_rows, stream_rows
 from db.tables import TrackingMedia
 
 
@@ -26,6 +27,16 @@ class TrackingMediaRepository(BaseRepository):
         query = query.order_by(TrackingMedia.created_at.desc())
         return list(await self.session.scalars(query))
 
+    async def get_instagram_id_map(self, instagram_username: str) -> dict[str, int]:
+        """Ids of saved media of username by their instagram_id"""
+        query = select_rows(TrackingMediaRef, TrackingMedia).filter_by(
+            instagram_username=instagram_username
+        )
+        return {
+            ref.instagram_id: ref.id
+            async for ref in stream_rows(self.session, query, TrackingMediaRef)
+        }
+
     async def get(self, model_id: int) -> TrackingMedia:
         return await self._get_one(id=model_id)
 
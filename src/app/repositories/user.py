@@ -1,4 +1,5 @@
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
+import datetime as dt
 
 from app.repositories.base import BaseRepository
 from db.tables import User
@@ -20,6 +21,26 @@ class UserRepository[Table: User, int](BaseRepository):
         query = select(self.base_table).filter_by(telegram_id=telegram_id)
         return await self.session.scalar(query)
 
+    async def update_activity(
+        self, activity: dict[int, dt.datetime], dormant_since: dt.datetime
+    ) -> list[int]:
+        """Save last activity time of users, return telegram ids of users who were dormant"""
+        query = select(User.telegram_id).where(
+            User.telegram_id.in_(list(activity)), User.last_activity_at < dormant_since
+        )
+        dormant = list(await self.session.scalars(query))
+        table = User.__table__
+        await self.session.execute(
+            update(table)
+            .where(table.c.telegram_id == bindparam("b_telegram_id"))
+            .values(last_activity_at=bindparam("b_last_activity_at")),
+            [
+                {"b_telegram_id": telegram_id, "b_last_activity_at": last_activity_at}
+                for telegram_id, last_activity_at in activity.items()
+            ],
+        )
+        return dormant
+
     async def update(self, model_id: int, **fields) -> User:
         return await self._update(model_id, **fields)
 
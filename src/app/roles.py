@@ -0,0 +1,17 @@
+import os
+
+ROLES = ("web", "bot", "scheduler")
+
+
+def enabled_roles() -> set[str]:
+    """
+    Subsystems enabled in this process, APP_ROLES is comma separated list of
+    web (HTTP routes), bot (Telegram updates) and scheduler (report scheduler).
+    All of them are enabled by default
+    """
+    value = os.getenv("APP_ROLES", "")
+    roles = {role.strip() for role in value.split(",") if role.strip()} or set(ROLES)
+    unknown = roles - set(ROLES)
+    if unknown:
+        raise ValueError(f"Unknown APP_ROLES: {', '.join(sorted(unknown))}")
+    return roles
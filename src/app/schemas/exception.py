@@ -2,8 +2,9 @@ import json
 
 
 class ApiException(Exception):
-    def __init__(self, message: str):
+    def __init__(self, message: str, status: int | None = None):
         self.message = message
+        self.status = status
 
     def detail(self) -> str | None:
         print(self.message)
@@ -12,3 +13,7 @@ class ApiException(Exception):
         except json.decoder.JSONDecodeError:
             return None
         return data.get("message") if isinstance(data, dict) else None
+
+
+class UpstreamUnavailableException(ApiException):
+    """Upstream is failing or its circuit is open"""
@@ -1,8 +1,17 @@
-from pydantic import BaseModel, ConfigDict, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl, PrivateAttr
 import datetime as dt
 
 
-class InstagramUserSchema(BaseModel):
+class InstagramSchema(BaseModel):
+    _stale: bool = PrivateAttr(default=False)
+
+    @property
+    def is_stale(self) -> bool:
+        """Served from cache while upstream is unavailable"""
+        return self._stale
+
+
+class InstagramUserSchema(InstagramSchema):
     id: str
     username: str
     full_name: str
@@ -16,7 +25,7 @@ class InstagramUserSchema(BaseModel):
         return (self.followers_count or 0) >= 20000 or (self.following_count or 0) >= 3000
 
 
-class InstagramUserStatsSchema(BaseModel):
+class InstagramUserStatsSchema(InstagramSchema):
     username: str
     media_count_difference: int
     followers_count_difference: int
@@ -24,7 +33,7 @@ class InstagramUserStatsSchema(BaseModel):
     previous_stats_date: dt.datetime
 
 
-class InstagramUserReportSchema(BaseModel):
+class InstagramUserReportSchema(InstagramSchema):
     id: int
     username: str
     requests_count: int
@@ -32,7 +41,7 @@ class InstagramUserReportSchema(BaseModel):
     finished_at: dt.datetime | None = None
 
 
-class InstagramMediaSchema(BaseModel):
+class InstagramMediaSchema(InstagramSchema):
     external_id: str
     caption_text: str | None = None
     created_at: dt.datetime
@@ -43,13 +52,13 @@ class InstagramMediaSchema(BaseModel):
     play_count: int | None = None
 
 
-class InstagramMediaListSchema(BaseModel):
+class InstagramMediaListSchema(InstagramSchema):
     items: list[InstagramMediaSchema]
     last_page: bool
     next_max_id: str | None = None
 
 
-class InstagramMediaStatsSchema(BaseModel):
+class InstagramMediaStatsSchema(InstagramSchema):
     external_id: str
     comment_count_current: int
     like_count_current: int
@@ -60,14 +69,14 @@ class InstagramMediaStatsSchema(BaseModel):
     created_at: dt.datetime | None = None
 
 
-class InstagramMediaUserStatsSchema(BaseModel):
+class InstagramMediaUserStatsSchema(InstagramSchema):
     like_count_sum: int
     comment_count_sum: int
     play_count_sum: int | None = None
     count: int
 
 
-class InstagramUserFollowersDifferenceSchema(BaseModel):
+class InstagramUserFollowersDifferenceSchema(InstagramSchema):
     username: str
     subscribes_usernames: list[str]
     unsubscribes_usernames: list[str]
@@ -75,7 +84,7 @@ class InstagramUserFollowersDifferenceSchema(BaseModel):
     created_at: dt.datetime
 
 
-class InstagramUserFollowingDifferenceSchema(BaseModel):
+class InstagramUserFollowingDifferenceSchema(InstagramSchema):
     username: str
     subscribes_usernames: list[str]
     unsubscribes_usernames: list[str]
@@ -83,6 +92,6 @@ class InstagramUserFollowingDifferenceSchema(BaseModel):
     created_at: dt.datetime
 
 
-class InstagramUserFollowDifferenceSchema(BaseModel):
+class InstagramUserFollowDifferenceSchema(InstagramSchema):
     username: str
     follow_usernames: list[str]
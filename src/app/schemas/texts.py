@@ -100,10 +100,16 @@ _private_tracking_text = """
 Профиль {schema.username} закрыт.
 """
 
+_stale_data_text = """
+
+⚠️ Сервис статистики временно недоступен, показаны сохранённые данные"""
+
 _tracking_not_found_text = """
 Профиль {tracking_username} не найден.
 """
 
+_tracking_report_error_text = "⚠️ Не удалось загрузить отчёт по {tracking_username}"
+
 _tracking_follower_text = """[[{tracking}]]((https://instagram.com/{tracking}))"""
 
 _tracking_report_text = """
@@ -155,6 +161,13 @@ def build_tracking_not_found_text(tracking_username: str) -> str:
     return _tracking_not_found_text.format(tracking_username=tracking_username)
 
 
+def build_tracking_report_error_text(tracking_username: str) -> str:
+    return escape_markdown(
+        _tracking_report_error_text.format(tracking_username=tracking_username),
+        escape_all=True,
+    )
+
+
 def build_tracking_private_text(schema: InstagramUserSchema) -> str:
     return _private_tracking_text.format(schema=schema)
 
@@ -166,9 +179,17 @@ def build_big_tracking_info_text(schema: InstagramUserSchema) -> str:
     )
 
 
+def build_stale_data_text(*schemas) -> str:
+    if not any(getattr(schema, "is_stale", False) for schema in schemas):
+        return ""
+    return escape_markdown(_stale_data_text)
+
+
 def build_tracking_info_text(schema: InstagramUserSchema) -> str:
     biography = descape_markdown(schema.biography if schema.biography else "")
-    return escape_markdown(_tracking_info_text.format(schema=schema, biography=biography))
+    return escape_markdown(
+        _tracking_info_text.format(schema=schema, biography=biography)
+    ) + build_stale_data_text(schema)
 
 
 def build_tracking_info_masked_text(schema: InstagramUserSchema) -> str:
@@ -220,19 +241,28 @@ def build_tracking_stats_text(
         followers_count_difference=followers_count_difference,
         following_count_difference=following_count_difference
     )
-    return escape_markdown(text)
+    return escape_markdown(text) + build_stale_data_text(change, weekly, monthly, tracking)
 
 
 def build_tracking_following_text(following: list[str]) -> str:
     return build_tracking_followers_text(following)
 
 
-def build_tracking_followers_text(followers: list[str]) -> str:
-    if not followers:
+def build_tracking_follower_line(username: str) -> str:
+    username = escape_markdown(username, escape_all=True)
+    return f"[{username}](https://instagram.com/{username})"
+
+
+def build_tracking_follower_lines_text(lines: list[str]) -> str:
+    """Join lines which are already rendered by build_tracking_follower_line"""
+    if not lines:
         return escape_markdown("Список пуст. Возможно, нужно подождать пока данные соберутся")
-    return "\n".join(
-        f"[{tracking}](https://instagram.com/{tracking})"
-        for tracking in map(lambda i: escape_markdown(i, escape_all=True), followers)
+    return "\n".join(lines)
+
+
+def build_tracking_followers_text(followers: list[str]) -> str:
+    return build_tracking_follower_lines_text(
+        [build_tracking_follower_line(username) for username in followers]
     )
 
 
@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+import asyncio
+import itertools
+import os
+import time
+
+from app.ratelimit import TokenBucket
+
+
+class Lane(IntEnum):
+    """Priority of outgoing message, lower is sent first"""
+
+    interactive = 0
+    report = 1
+    alert = 2
+
+
+_lane: ContextVar[Lane] = ContextVar("send_lane", default=Lane.interactive)
+
+
+def current_lane() -> Lane:
+    return _lane.get()
+
+
+@contextmanager
+def send_lane(lane: Lane):
+    """Send messages of enclosed code (and tasks it spawns) in `lane`"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class SendScheduler:
+    """
+    Grant sends of chats in Telegram limits: global rate, rate per private chat and per group.
+    Waiting sends are granted by lane and then in arrival order, so interactive replies
+    overtake queued reports and admin alerts. Send of a chat which is out of tokens
+    doesn't hold sends of other chats
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+        group_rate: float,
+        max_chat_buckets: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_chat_buckets = max_chat_buckets
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._waiting: list[tuple[Lane, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self.granted = {lane.name: 0 for lane in Lane}
+        self.wait_seconds = {lane.name: 0.0 for lane in Lane}
+        self.max_wait_seconds = {lane.name: 0.0 for lane in Lane}
+        self.retry_after = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_chat_buckets:
+                self._evict_idle_buckets()
+            # Group chats have negative ids
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _evict_idle_buckets(self):
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if bucket.delay(bucket.capacity) == 0:
+                del self._chat_buckets[chat_id]
+
+    def _try_grant(self, chat_id: int) -> bool:
+        chat_bucket = self._chat_bucket(chat_id)
+        if chat_bucket.delay() > 0 or self.global_bucket.delay() > 0:
+            return False
+        chat_bucket.try_acquire()
+        self.global_bucket.try_acquire()
+        return True
+
+    async def acquire(self, chat_id: int, lane: Lane | None = None):
+        """Wait until message to chat can be sent"""
+        lane = current_lane() if lane is None else lane
+        if not self._waiting and self._try_grant(chat_id):
+            self.granted[lane.name] += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((lane, next(self._seq), chat_id, future))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        started_at = time.monotonic()
+        try:
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+        waited = time.monotonic() - started_at
+        self.granted[lane.name] += 1
+        self.wait_seconds[lane.name] += waited
+        self.max_wait_seconds[lane.name] = max(self.max_wait_seconds[lane.name], waited)
+
+    def pause_chat(self, chat_id: int, seconds: float):
+        """Telegram asked to retry after `seconds`, hold sends to chat until then"""
+        self._chat_bucket(chat_id).drain(seconds)
+        self.retry_after += 1
+        self._wakeup.set()
+
+    def _grant_next(self) -> float | None:
+        """Grant sends which fit into limits, return seconds until next one can be granted"""
+        self._waiting = [entry for entry in self._waiting if not entry[3].done()]
+        self._waiting.sort(key=lambda entry: entry[:2])
+        delay = None
+        index = 0
+        while index < len(self._waiting):
+            global_delay = self.global_bucket.delay()
+            if global_delay > 0:
+                return global_delay
+            lane, _, chat_id, future = self._waiting[index]
+            if self._try_grant(chat_id):
+                future.set_result(None)
+                del self._waiting[index]
+                continue
+            chat_delay = self._chat_bucket(chat_id).delay()
+            delay = chat_delay if delay is None else min(delay, chat_delay)
+            index += 1
+        return delay
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._grant_next()
+            if not self._waiting:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        queued = {lane.name: 0 for lane in Lane}
+        for lane, _, _, future in self._waiting:
+            if not future.done():
+                queued[lane.name] += 1
+        return {
+            "queued": queued,
+            "granted": self.granted,
+            "avg_wait_seconds": {
+                lane: round(self.wait_seconds[lane] / count, 3) if count else 0
+                for lane, count in self.granted.items()
+            },
+            "max_wait_seconds": {lane: round(value, 3) for lane, value in self.max_wait_seconds.items()},
+            "retry_after": self.retry_after,
+            "chats": len(self._chat_buckets),
+            "global": self.global_bucket.stats(),
+        }
+
+
+send_scheduler = SendScheduler(
+    global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", 30)),
+    chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", 1)),
+    chat_burst=float(os.getenv("TELEGRAM_CHAT_BURST", 3)),
+    group_rate=float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", 20)) / 60,
+)
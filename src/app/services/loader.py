@@ -0,0 +1,85 @@
+from typing import Awaitable, Callable
+import asyncio
+import time
+
+from loguru import logger
+
+
+class _ShortCircuit(Exception):
+    def __init__(self, error: str):
+        self.error = error
+
+
+class ConcurrentLoader:
+    """
+    Run screen data calls concurrently.
+    Call receives results of calls from depends_on as keyword arguments.
+    First exception cancels the other calls and is raised as is.
+    If short_circuit call returns error text (str), the other calls are cancelled and text is stored in `error`.
+    When several short_circuit calls return error, the one added first wins, whichever finished first
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[str, tuple[Callable[..., Awaitable], tuple[str, ...], bool]] = {}
+        self.results: dict[str, object] = {}
+        self.timings: dict[str, float] = {}
+        self.error: str | None = None
+        self._errors: dict[str, str] = {}
+
+    def add(
+        self,
+        name: str,
+        coroutine_factory: Callable[..., Awaitable],
+        depends_on: tuple[str, ...] = (),
+        short_circuit: bool = False,
+    ):
+        for dependency in depends_on:
+            if dependency not in self._calls:
+                raise ValueError(f"Unknown dependency {dependency} of {name}")
+        self._calls[name] = (coroutine_factory, depends_on, short_circuit)
+
+    async def _run_call(self, name: str, tasks: dict[str, asyncio.Task]):
+        coroutine_factory, depends_on, short_circuit = self._calls[name]
+        dependencies = {dependency: await tasks[dependency] for dependency in depends_on}
+        started_at = time.perf_counter()
+        result = await coroutine_factory(**dependencies)
+        self.timings[name] = time.perf_counter() - started_at
+        if short_circuit and isinstance(result, str):
+            self._errors[name] = result
+            raise _ShortCircuit(result)
+        self.results[name] = result
+        return result
+
+    async def run(self) -> dict[str, object]:
+        started_at = time.perf_counter()
+        tasks: dict[str, asyncio.Task] = {}
+        for name in self._calls:
+            tasks[name] = asyncio.create_task(self._run_call(name, tasks))
+        try:
+            for task in asyncio.as_completed(tasks.values()):
+                await task
+        except _ShortCircuit:
+            await self._resolve_error(tasks)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            timings = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.timings.items())
+            logger.debug(
+                f"Loaded {self.name} in {(time.perf_counter() - started_at) * 1000:.0f}ms ({timings})"
+            )
+        return self.results
+
+    async def _resolve_error(self, tasks: dict[str, asyncio.Task]):
+        """Wait for short_circuit calls added before the failed one and take the first error"""
+        for name, (_, _, short_circuit) in self._calls.items():
+            if not short_circuit:
+                continue
+            if name not in self._errors:
+                result = (await asyncio.gather(tasks[name], return_exceptions=True))[0]
+                if isinstance(result, Exception) and not isinstance(result, _ShortCircuit):
+                    raise result
+            if name in self._errors:
+                self.error = self._errors[name]
+                return
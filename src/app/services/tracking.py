@@ -1,14 +1,18 @@
+import asyncio
 import datetime as dt
-from typing import Annotated, AsyncGenerator
+import os
+from typing import Annotated, AsyncGenerator, Awaitable, Callable
 from urllib.parse import urlparse
 
 from aiogram3_di import Depends
+from loguru import logger
 
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram import types
 from aiogram.methods import TelegramMethod
 
+from app.repositories.cache import PackedStrings, paged_view_cache
 from app.repositories.instagram import InstagramRepository
 from app.repositories.keyboard import KeyboardRepository
 from app.repositories.subscription import SubscriptionRepository
@@ -20,25 +24,36 @@ from app.schemas.action_callback import (
     TrackingReportCallback,
 )
 from app.schemas.forms import TrackingCreateForm
-from app.schemas.instagram import InstagramUserSchema
+from app.schemas.instagram import InstagramUserFollowDifferenceSchema, InstagramUserSchema
 from app.schemas.message import TextMessage
 from app.schemas.texts import (
     build_big_tracking_info_text,
-    build_tracking_followers_text,
+    build_tracking_follower_line,
+    build_tracking_follower_lines_text,
     build_tracking_info_masked_text,
     build_tracking_info_text,
     build_tracking_not_found_text,
     build_tracking_private_text,
+    build_tracking_report_error_text,
     build_tracking_report_text,
     build_tracking_stats_text,
     build_tracking_subscribe_text,
     build_tracking_unsubscribe_text,
     tracking_big_subscribe_text
 )
+from app.services.loader import ConcurrentLoader
 from app.services.utils import build_aiogram_method
+from db.tables import Tracking
 
 
 class TrackingService:
+    report_concurrency = int(os.getenv("REPORT_CONCURRENCY", 5))
+    report_digest_enabled = os.getenv("REPORT_DIGEST_ENABLED", "false").lower() == "true"
+    report_digest_separator = "\n➖➖➖➖➖\n"
+    max_message_length = 4096
+    paged_view_cache = paged_view_cache
+    follow_view_page_size = 15
+
     def __init__(
         self,
         tracking_repository: TrackingRepository,
@@ -215,7 +230,7 @@ class TrackingService:
     async def handle_settings(
         self, query: CallbackQuery, data: TrackingActionCallback
     ) -> TelegramMethod:
-        tariffs = await self.tariff_repository.list()
+        tariffs = await self.tariff_repository.list_rows()
         subscription = await self.subscription_repository.get(
             user_telegram_id=query.from_user.id, tracking_username=data.username
         )
@@ -318,29 +333,35 @@ class TrackingService:
     async def handle_tracking_stats(
         self, query: CallbackQuery, data: TrackingActionCallback
     ) -> TelegramMethod:
-        user_info = await self.instagram_repository.get_user_info(data.username)
-        user_stats = await self.instagram_repository.get_user_stats(data.username)
-        if isinstance(user_stats, str):
-            return build_aiogram_method(
-                None,
-                message=TextMessage(
-                    text=user_stats,
-                    reply_markup=self.keyboard_repository.build_to_tracking_show_keyboard(
-                        data.username
-                    ),
-                ),
-                tg_object=query,
-                use_edit=True,
-            )
-
-        weekly_media_stats = await self.instagram_repository.get_media_user_stats(
-            data.username, days=7
-        )
-        if isinstance(weekly_media_stats, str):
+        loader = ConcurrentLoader("tracking_stats")
+        loader.add(
+            "user_info", lambda: self.instagram_repository.get_user_info(data.username)
+        )
+        loader.add(
+            "user_stats",
+            lambda: self.instagram_repository.get_user_stats(data.username),
+            short_circuit=True,
+        )
+        loader.add(
+            "weekly_media_stats",
+            lambda: self.instagram_repository.get_media_user_stats(data.username, days=7),
+            short_circuit=True,
+        )
+        loader.add(
+            "monthly_media_stats",
+            lambda: self.instagram_repository.get_media_user_stats(data.username, days=30),
+            short_circuit=True,
+        )
+        loader.add(
+            "user_reports",
+            lambda: self.instagram_repository.get_user_reports(data.username),
+        )
+        results = await loader.run()
+        if loader.error is not None:
             return build_aiogram_method(
                 None,
                 message=TextMessage(
-                    text=weekly_media_stats,
+                    text=loader.error,
                     reply_markup=self.keyboard_repository.build_to_tracking_show_keyboard(
                         data.username
                     ),
@@ -349,30 +370,15 @@ class TrackingService:
                 use_edit=True,
             )
 
-        monthly_media_stats = await self.instagram_repository.get_media_user_stats(
-            data.username, days=30
-        )
-        if isinstance(monthly_media_stats, str):
-            return build_aiogram_method(
-                None,
-                message=TextMessage(
-                    text=monthly_media_stats,
-                    reply_markup=self.keyboard_repository.build_to_tracking_show_keyboard(
-                        data.username
-                    ),
-                ),
-                tg_object=query,
-                use_edit=True,
-            )
-
-        user_reports = await self.instagram_repository.get_user_reports(data.username)
-
         message = TextMessage(
             text=build_tracking_stats_text(
-                user_stats, weekly_media_stats, monthly_media_stats, user_info
+                results["user_stats"],
+                results["weekly_media_stats"],
+                results["monthly_media_stats"],
+                results["user_info"],
             ),
             reply_markup=self.keyboard_repository.build_tracking_stats_keyboard(
-                data.username, user_reports[0].id
+                data.username, results["user_reports"][0].id
             ),
             parse_mode="MarkdownV2",
         )
@@ -380,107 +386,219 @@ class TrackingService:
             None, message=message, tg_object=query, use_edit=True
         )
 
-    async def handle_tracking_followers_following_collision(
-        self, query: CallbackQuery, data: TrackingActionCallback
+    async def _handle_follow_view(
+        self,
+        query: CallbackQuery,
+        data: TrackingActionCallback,
+        action: str,
+        fetch: Callable[[str], Awaitable[InstagramUserFollowDifferenceSchema]],
     ) -> TelegramMethod:
-        info = await self.instagram_repository.get_user_following_followers_collision(
-            data.username
-        )
-        usernames = info.follow_usernames[(data.page - 1) * 15 : data.page * 15]
+        """Render list once per (username, view), page flips are served from paged view cache"""
+        key = (data.username, action)
+        lines = self.paged_view_cache.get(key)
+        if lines is None:
+            info = await fetch(data.username)
+            lines = PackedStrings(
+                [build_tracking_follower_line(username) for username in info.follow_usernames]
+            )
+            if not info.is_stale:
+                self.paged_view_cache.set(key, lines)
         message = TextMessage(
-            text=build_tracking_followers_text(usernames),
+            text=build_tracking_follower_lines_text(
+                lines.page(data.page, self.follow_view_page_size)
+            ),
             reply_markup=self.keyboard_repository.build_paginated_with_to_tracking_show(
-                Action.tracking_followers_following_collision.action,
+                action,
                 data.username,
-                len(info.follow_usernames),
+                len(lines),
                 data.page,
-                on_page_count=15
+                on_page_count=self.follow_view_page_size
             ),
             parse_mode="MarkdownV2",
         )
         return build_aiogram_method(None, tg_object=query, message=message)
 
-    async def handle_tracking_followers_following_difference(
+    async def handle_tracking_followers_following_collision(
         self, query: CallbackQuery, data: TrackingActionCallback
     ) -> TelegramMethod:
-        info = await self.instagram_repository.get_user_followers_following_difference(
-            data.username
+        return await self._handle_follow_view(
+            query,
+            data,
+            Action.tracking_followers_following_collision.action,
+            self.instagram_repository.get_user_following_followers_collision,
         )
-        usernames = info.follow_usernames[(data.page - 1) * 15 : data.page * 15]
-        message = TextMessage(
-            text=build_tracking_followers_text(usernames),
-            reply_markup=self.keyboard_repository.build_paginated_with_to_tracking_show(
-                Action.tracking_followers_following_difference.action,
-                data.username,
-                len(info.follow_usernames),
-                data.page,
-                on_page_count=15
-            ),
-            parse_mode="MarkdownV2",
+
+    async def handle_tracking_followers_following_difference(
+        self, query: CallbackQuery, data: TrackingActionCallback
+    ) -> TelegramMethod:
+        return await self._handle_follow_view(
+            query,
+            data,
+            Action.tracking_followers_following_difference.action,
+            self.instagram_repository.get_user_followers_following_difference,
         )
-        return build_aiogram_method(None, tg_object=query, message=message)
 
     async def handle_tracking_following_followers_difference(
         self, query: CallbackQuery, data: TrackingActionCallback
     ) -> TelegramMethod:
-        info = await self.instagram_repository.get_user_following_followers_difference(
-            data.username
+        return await self._handle_follow_view(
+            query,
+            data,
+            Action.tracking_following_followers_difference.action,
+            self.instagram_repository.get_user_following_followers_difference,
         )
-        usernames = info.follow_usernames[(data.page - 1) * 15 : data.page * 15]
-        message = TextMessage(
-            text=build_tracking_followers_text(usernames),
-            reply_markup=self.keyboard_repository.build_paginated_with_to_tracking_show(
-                Action.tracking_following_followers_difference.action,
-                data.username,
-                len(info.follow_usernames),
-                data.page,
-                on_page_count=15
-            ),
-            parse_mode="MarkdownV2",
-        )
-        return build_aiogram_method(None, tg_object=query, message=message)
 
     async def handle_tracking_hidden_followers(
         self, query: CallbackQuery, data: TrackingActionCallback
     ) -> TelegramMethod:
-        info = await self.instagram_repository.get_user_hidden_followers(data.username)
-        usernames = info.follow_usernames[(data.page - 1) * 15 : data.page * 15]
-        message = TextMessage(
-            text=build_tracking_followers_text(usernames),
-            reply_markup=self.keyboard_repository.build_paginated_with_to_tracking_show(
-                Action.tracking_hidden_followers.action,
-                data.username,
-                len(info.follow_usernames),
-                data.page,
-                on_page_count=15
-            ),
-            parse_mode="MarkdownV2",
+        return await self._handle_follow_view(
+            query,
+            data,
+            Action.tracking_hidden_followers.action,
+            self.instagram_repository.get_user_hidden_followers,
         )
-        return build_aiogram_method(None, tg_object=query, message=message)
 
-    async def handle_report_trackings(
-        self, tg_object: CallbackQuery | Message
-    ) -> AsyncGenerator[TelegramMethod]:
-        for tracking in await self.tracking_repository.list(
-            creator_telegram_id=tg_object.from_user.id
-        ):
-            user_info = await self.instagram_repository.get_user_info(
-                tracking.instagram_username
-            )
-            user_stats = await self.instagram_repository.get_user_stats(
-                tracking.instagram_username
+    async def _load_tracking_report(
+        self,
+        tracking: Tracking,
+        user_info: InstagramUserSchema | None,
+        semaphore: asyncio.Semaphore,
+    ) -> tuple[Tracking, str]:
+        username = tracking.instagram_username
+        try:
+            return tracking, await self._build_tracking_report_text(username, user_info, semaphore)
+        except Exception as e:
+            # One failed tracking doesn't drop reports of the others
+            logger.warning(f"Report of {username} is not loaded: {e!r}")
+            return tracking, build_tracking_report_error_text(username)
+
+    async def _build_tracking_report_text(
+        self,
+        username: str,
+        user_info: InstagramUserSchema | None,
+        semaphore: asyncio.Semaphore,
+    ) -> str:
+        async with semaphore:
+            loader = ConcurrentLoader("tracking_report")
+            loader.add(
+                "user_stats", lambda: self.instagram_repository.get_user_stats(username)
             )
-            media_stats = await self.instagram_repository.get_media_user_stats(
-                tracking.instagram_username
+            loader.add(
+                "media_stats",
+                lambda: self.instagram_repository.get_media_user_stats(username),
             )
-            message = TextMessage(
-                text=build_tracking_report_text(user_stats, media_stats, user_info),
-                reply_markup=self.keyboard_repository.build_tracking_report_keyboard(
-                    tracking.instagram_username, report_id=-1
+            results = await loader.run()
+        return build_tracking_report_text(
+            results["user_stats"], results["media_stats"], user_info
+        )
+
+    def _split_text(self, text: str) -> list[str]:
+        """Split text by lines into parts which fit into one message"""
+        parts = [""]
+        for line in text.split("\n"):
+            while len(line) > self.max_message_length:
+                parts.append(line[: self.max_message_length])
+                line = line[self.max_message_length :]
+            if parts[-1] and len(parts[-1]) + len(line) + 1 > self.max_message_length:
+                parts.append(line)
+            else:
+                parts[-1] = f"{parts[-1]}\n{line}" if parts[-1] else line
+        return [part for part in parts if part]
+
+    def _build_report_methods(
+        self, tg_object: CallbackQuery | Message, text: str, reply_markup: types.InlineKeyboardMarkup
+    ) -> list[TelegramMethod]:
+        """Report message, split into several if it's too long. Keyboard is under the last one"""
+        parts = self._split_text(text)
+        return [
+            build_aiogram_method(
+                tg_object.from_user.id,
+                TextMessage(
+                    text=part,
+                    reply_markup=reply_markup if index == len(parts) - 1 else None,
+                    parse_mode="MarkdownV2",
                 ),
-                parse_mode="MarkdownV2",
             )
-            yield build_aiogram_method(tg_object.from_user.id, message)
+            for index, part in enumerate(parts)
+        ]
+
+    def _build_reports_digest(
+        self, tg_object: CallbackQuery | Message, reports: list[tuple[Tracking, str]]
+    ) -> list[TelegramMethod]:
+        """
+        Merge reports into as few messages as Telegram message length allows.
+        Report which doesn't fit into one message is sent alone, split by lines
+        """
+        chunks: list[list[tuple[Tracking, str]]] = [[]]
+        length = 0
+        for tracking, text in reports:
+            if chunks[-1] and length + len(text) + len(self.report_digest_separator) > self.max_message_length:
+                chunks.append([])
+                length = 0
+            chunks[-1].append((tracking, text))
+            length += len(text) + len(self.report_digest_separator)
+
+        methods = []
+        for chunk in chunks:
+            methods.extend(
+                self._build_report_methods(
+                    tg_object,
+                    self.report_digest_separator.join(text for _, text in chunk),
+                    self.keyboard_repository.build_trackings_list_keyboard(
+                        [tracking for tracking, _ in chunk]
+                    ),
+                )
+            )
+        return methods
+
+    async def handle_report_trackings(
+        self, tg_object: CallbackQuery | Message, digest: bool | None = None
+    ) -> AsyncGenerator[TelegramMethod]:
+        """
+        Load reports concurrently and yield each one as soon as it's ready.
+        With digest reports are merged into one message (or several, if they are too long)
+        """
+        if digest is None:
+            digest = self.report_digest_enabled
+        trackings = await self.tracking_repository.list(
+            creator_telegram_id=tg_object.from_user.id
+        )
+        if not trackings:
+            return
+
+        users_info = await self.instagram_repository.get_users_info_bulk(
+            [tracking.instagram_username for tracking in trackings]
+        )
+        semaphore = asyncio.Semaphore(self.report_concurrency)
+        tasks = [
+            asyncio.create_task(
+                self._load_tracking_report(
+                    tracking, users_info.get(tracking.instagram_username), semaphore
+                )
+            )
+            for tracking in trackings
+        ]
+        try:
+            if digest:
+                reports = [await task for task in tasks]
+                for method in self._build_reports_digest(tg_object, reports):
+                    yield method
+                return
+
+            for task in asyncio.as_completed(tasks):
+                tracking, text = await task
+                for method in self._build_report_methods(
+                    tg_object,
+                    text,
+                    self.keyboard_repository.build_tracking_report_keyboard(
+                        tracking.instagram_username, report_id=-1
+                    ),
+                ):
+                    yield method
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def handle_report_tracking(
         self, tg_object: CallbackQuery | Message, data: TrackingReportCallback
@@ -55,19 +55,14 @@ class TrackingFollowerService:
             subscription_repository=subscription_repository,
         )
 
-    async def _fetch_followers_paginated(
-        self, report_id: int, paginate_key: str, on_page_count: int = 25
-    ) -> tuple[list[list[str]], int]:
-        followers_diff = (
-            await self.instagram_repository.get_report_followers_difference(report_id)
-        )
-
-        usernames = getattr(followers_diff, paginate_key)
-        paginated_usernames = [
-            usernames[i : i + on_page_count]
-            for i in range(0, len(usernames), on_page_count)
-        ]
-        return paginated_usernames, len(usernames)
+    async def _fetch_followers_page(
+        self, report_id: int, paginate_key: str, page: int, on_page_count: int = 25
+    ) -> tuple[list[str], int]:
+        """Return usernames of page and total count, report difference is cached once downloaded"""
+        usernames = (
+            await self.instagram_repository.get_report_difference_usernames(report_id, "followers")
+        )[paginate_key]
+        return usernames.page(page, on_page_count), len(usernames)
 
     async def handle_tracking_followers(
         self, query: CallbackQuery, data: TrackingActionCallback
@@ -93,15 +88,15 @@ class TrackingFollowerService:
             use_edit=False,
         )
 
-        paginated_subscribes, total_count = await self._fetch_followers_paginated(
-            data.report_id, "subscribes_usernames"
+        page_usernames, total_count = await self._fetch_followers_page(
+            data.report_id, "subscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Подписавшихся нет")
         else:
             message = TextMessage(
-                text=build_tracking_followers_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_followers_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_new_unsubscribes_keyboard(
                     data.username,
                     total_count,
@@ -119,15 +114,15 @@ class TrackingFollowerService:
         )
 
     async def _handle_show_new_subscribes(self, query, data):
-        paginated_subscribes, total_count = await self._fetch_followers_paginated(
-            data.report_id, "subscribes_usernames"
+        page_usernames, total_count = await self._fetch_followers_page(
+            data.report_id, "subscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Подписавшихся нет")
         else:
             message = TextMessage(
-                text=build_tracking_followers_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_followers_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_new_subscribes_keyboard(
                     data.username,
                     total_count,
@@ -161,15 +156,15 @@ class TrackingFollowerService:
             use_edit=False,
         )
 
-        paginated_subscribes, total_count = await self._fetch_followers_paginated(
-            data.report_id, "unsubscribes_usernames"
+        page_usernames, total_count = await self._fetch_followers_page(
+            data.report_id, "unsubscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Отписавшихся нет")
         else:
             message = TextMessage(
-                text=build_tracking_followers_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_followers_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_new_unsubscribes_keyboard(
                     data.username,
                     total_count,
@@ -187,15 +182,15 @@ class TrackingFollowerService:
         )
 
     async def _handle_show_new_unsubscribes(self, query, data):
-        paginated_subscribes, total_count = await self._fetch_followers_paginated(
-            data.report_id, "unsubscribes_usernames"
+        page_usernames, total_count = await self._fetch_followers_page(
+            data.report_id, "unsubscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Отписавшихся нет")
         else:
             message = TextMessage(
-                text=build_tracking_followers_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_followers_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_new_unsubscribes_keyboard(
                     data.username,
                     total_count,
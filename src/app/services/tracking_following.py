@@ -69,23 +69,14 @@ class TrackingFollowingService:
         )
         return build_aiogram_method(query.from_user.id, message, use_edit=True)
 
-    async def _fetch_following_paginated(
-        self, report_id: int, paginate_key: str, on_page_count: int = 25
-    ) -> tuple[list[list[str]], int]:
-        following_diff = (
-            await self.instagram_repository.get_report_following_difference(report_id)
-        )
-
-        usernames = []
-        for diff in following_diff:
-            if diff.report_id != report_id:
-                continue
-            usernames += getattr(diff, paginate_key)
-        paginated_usernames = [
-            usernames[i : i + on_page_count]
-            for i in range(0, len(usernames), on_page_count)
-        ]
-        return paginated_usernames, len(usernames)
+    async def _fetch_following_page(
+        self, report_id: int, paginate_key: str, page: int, on_page_count: int = 25
+    ) -> tuple[list[str], int]:
+        """Return usernames of page and total count, report difference is cached once downloaded"""
+        usernames = (
+            await self.instagram_repository.get_report_difference_usernames(report_id, "following")
+        )[paginate_key]
+        return usernames.page(page, on_page_count), len(usernames)
 
     async def handle_tracking_following(
         self, query: CallbackQuery, data: TrackingActionCallback
@@ -111,15 +102,15 @@ class TrackingFollowingService:
             use_edit=False,
         )
 
-        paginated_subscribes, total_count = await self._fetch_following_paginated(
-            data.report_id, "subscribes_usernames"
+        page_usernames, total_count = await self._fetch_following_page(
+            data.report_id, "subscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Подписок нет")
         else:
             message = TextMessage(
-                text=build_tracking_following_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_following_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_subscribtions_keyboard(
                     data.username,
                     total_count,
@@ -137,15 +128,15 @@ class TrackingFollowingService:
         )
 
     async def _handle_show_new_subscribes(self, query, data):
-        paginated_subscribes, total_count = await self._fetch_following_paginated(
-            data.report_id, "subscribes_usernames"
+        page_usernames, total_count = await self._fetch_following_page(
+            data.report_id, "subscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Подписок нет")
         else:
             message = TextMessage(
-                text=build_tracking_following_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_following_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_subscribtions_keyboard(
                     data.username,
                     total_count,
@@ -179,15 +170,15 @@ class TrackingFollowingService:
             use_edit=False,
         )
 
-        paginated_subscribes, total_count = await self._fetch_following_paginated(
-            data.report_id, "unsubscribes_usernames"
+        page_usernames, total_count = await self._fetch_following_page(
+            data.report_id, "unsubscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Отписок нет")
         else:
             message = TextMessage(
-                text=build_tracking_following_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_following_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_unsubscribes_keyboard(
                     data.username,
                     total_count,
@@ -205,15 +196,15 @@ class TrackingFollowingService:
         )
 
     async def _handle_show_new_unsubscribes(self, query, data):
-        paginated_subscribes, total_count = await self._fetch_following_paginated(
-            data.report_id, "unsubscribes_usernames"
+        page_usernames, total_count = await self._fetch_following_page(
+            data.report_id, "unsubscribes_usernames", data.page
         )
 
-        if not paginated_subscribes or len(paginated_subscribes) < data.page:
+        if not page_usernames:
             message = TextMessage(text="Отписок нет")
         else:
             message = TextMessage(
-                text=build_tracking_following_text(paginated_subscribes[data.page - 1]),
+                text=build_tracking_following_text(page_usernames),
                 reply_markup=self.keyboard_repository.build_tracking_unsubscribes_keyboard(
                     data.username,
                     total_count,
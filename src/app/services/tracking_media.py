@@ -29,6 +29,7 @@ from app.schemas.message import (
     VideoMessage,
 )
 from app.schemas.texts import build_media_stats_text
+from app.services.loader import ConcurrentLoader
 from app.services.utils import build_aiogram_method
 from db.tables import TrackingMedia
 
@@ -87,10 +88,9 @@ class TrackingMediaService:
         return tracking_medias
 
     async def _update_tracking_medias(self, username: str) -> list[TrackingMedia]:
-        current_media = await self.tracking_media_repository.list(
-            instagram_username=username, count=10000
+        current_media_instagram_id_to_id = (
+            await self.tracking_media_repository.get_instagram_id_map(username)
         )
-        current_media_instagram_id_to_id = {m.instagram_id: m.id for m in current_media}
 
         max_id = None
         tracking_medias = []
@@ -210,8 +210,11 @@ class TrackingMediaService:
         model = await self.tracking_media_repository.get_by_instagram_id(
             data.instagram_id
         )
-        info = await self.instagram_repository.get_media_info(data.instagram_id)
-        stats = await self.instagram_repository.get_media_stats(data.instagram_id)
+        loader = ConcurrentLoader("tracking_media_stats")
+        loader.add("info", lambda: self.instagram_repository.get_media_info(data.instagram_id))
+        loader.add("stats", lambda: self.instagram_repository.get_media_stats(data.instagram_id))
+        results = await loader.run()
+        info, stats = results["info"], results["stats"]
         if info.display_uri is None:
             message = TextMessage(
                 text=build_media_stats_text(stats, model),
@@ -0,0 +1,64 @@
+from contextvars import ContextVar
+import os
+
+from aiogram.methods import TelegramMethod
+
+WEBHOOK_REPLY_ENABLED = os.getenv("BOT_WEBHOOK_REPLY", "false").lower() == "true"
+
+
+class WebhookReply:
+    """
+    First Telegram method of webhook update, which is sent in webhook response
+    instead of separate API request. Method is sent through API anyway if handler
+    makes another request after it, so messages keep their order
+    """
+
+    def __init__(self):
+        self.method: TelegramMethod | None = None
+        self.enabled = True
+        self.closed = False
+
+    def capture(self, method: TelegramMethod) -> bool:
+        if self.closed or not self.enabled or self.method is not None:
+            return False
+        self.method = method
+        return True
+
+    def take(self) -> TelegramMethod | None:
+        method, self.method = self.method, None
+        return method
+
+    def close(self) -> TelegramMethod | None:
+        """Stop capturing (webhook response is sent) and return method for the response"""
+        self.closed = True
+        return self.take()
+
+
+class WebhookReplyStats:
+    def __init__(self):
+        self.replied = 0  # API requests saved
+        self.flushed = 0  # Captured methods sent through API because of follow-up request
+        self.disabled = 0  # Updates of handlers which need sent message
+
+    def stats(self) -> dict:
+        return {
+            "enabled": WEBHOOK_REPLY_ENABLED,
+            "replied": self.replied,
+            "flushed": self.flushed,
+            "disabled": self.disabled,
+        }
+
+
+webhook_reply_stats = WebhookReplyStats()
+_webhook_reply: ContextVar[WebhookReply | None] = ContextVar("webhook_reply", default=None)
+
+
+def current_webhook_reply() -> WebhookReply | None:
+    return _webhook_reply.get()
+
+
+def start_webhook_reply() -> WebhookReply:
+    """Capture first method of update processed in current context"""
+    reply = WebhookReply()
+    _webhook_reply.set(reply)
+    return reply
@@ -0,0 +1,25 @@
+"""spread report schedule
+
+Revision ID: c4a2d3e5f6b7
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a2d3e5f6b7'
+down_revision = 'b3f1c2d4e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reschedule every subscription with per subscription offset on next scheduler tick
+    op.execute(sa.text("UPDATE subscriptions SET next_report_at = NULL"))
+
+
+def downgrade() -> None:
+    op.execute(sa.text("UPDATE subscriptions SET next_report_at = NULL"))
@@ -0,0 +1,63 @@
+"""
+Read models of bulk scans. Rows are selected column by column with Core select,
+so they don't go to identity map and don't trigger selectin relationships of tables
+(e.g. Tariff.subscriptions -> Subscription.user -> User.subscriptions)
+"""
+from typing import AsyncIterator, NamedTuple
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import datetime as dt
+
+STREAM_CHUNK_SIZE = 1000
+
+
+class TariffRow(NamedTuple):
+    id: int
+    payment_amount: int
+    access_days: int
+    requests_balance: int
+    tracking_report_interval: str
+
+
+class TrackingMediaRef(NamedTuple):
+    id: int
+    instagram_id: str
+
+
+class ReportWindow(NamedTuple):
+    tracking_username: str
+    interval: int
+    window_start: dt.datetime
+
+
+class ScheduledReportRef(NamedTuple):
+    id: int
+    tracking_username: str
+
+
+class OutboxRow(NamedTuple):
+    id: int
+    chat_id: int
+    kind: str
+    payload: dict
+
+
+def select_rows(row_model: type[NamedTuple], table) -> Select:
+    """Select columns of table named as fields of row_model"""
+    return select(*(getattr(table, field) for field in row_model._fields))
+
+
+async def stream_rows(
+    session: AsyncSession, query: Select, row_model: type[NamedTuple]
+) -> AsyncIterator[NamedTuple]:
+    """Fetch rows with server side cursor by STREAM_CHUNK_SIZE"""
+    result = await session.stream(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    async for row in result:
+        yield row_model(*row)
+
+
+async def stream_scalars(session: AsyncSession, query: Select) -> AsyncIterator:
+    result = await session.stream_scalars(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    async for value in result:
+        yield value
+
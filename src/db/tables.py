@@ -1,4 +1,4 @@
-from sqlalchemy import BIGINT, ForeignKey, UniqueConstraint, false, func, select, text, true
+from sqlalchemy import BIGINT, JSON, ForeignKey, UniqueConstraint, false, func, select, text, true
 from sqlalchemy.orm import Mapped as M, relationship
 from sqlalchemy.orm import mapped_column as column
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -34,6 +34,7 @@ class User(BaseMixin, Base):
     telegram_username: M[str | None]
     telegram_name: M[str | None]
     referral_id: M[str | None] = column(ForeignKey("referrals.id", ondelete="SET NULL"))
+    last_activity_at: M[dt.datetime] = column(server_default=sql_utcnow, doc="UTC, written in batches")
 
     trackings: M[list['Tracking']] = relationship(back_populates="creator", lazy="noload")
     subscriptions: M[list['Subscription']] = relationship(back_populates="user", lazy="selectin", cascade="delete")
@@ -124,11 +125,38 @@ class Subscription(BaseMixin, Base):
     renewal_enabled: M[bool] = column(server_default=true())
     requests_available: M[int]
     cloudpayments_subscription_id: M[str] = column(doc="Cloudpayments SubscriptionId")
+    next_report_at: M[dt.datetime | None] = column(index=True, doc="UTC, NULL until scheduled")
 
     user: M["User"] = relationship(back_populates="subscriptions", lazy="selectin")
     tariff: M["Tariff"] = relationship(back_populates="subscriptions", lazy="selectin")
 
 
+class ScheduledReport(BaseMixin, Base):
+    """One upstream report per tracked username and schedule window, shared by every subscriber"""
+    __tablename__ = "scheduled_reports"
+
+    tracking_username: M[str]
+    report_interval: M[int] = column(doc="В секундах")
+    window_start: M[dt.datetime] = column(index=True, doc="UTC")
+    report_id: M[int | None]
+
+    __table_args__ = (
+        UniqueConstraint("tracking_username", "report_interval", "window_start", name="scheduled_report_uq"),
+    )
+
+
+class OutboxMessage(BaseMixin, Base):
+    """Bot notification saved with the change which caused it and sent by outbox dispatcher"""
+    __tablename__ = "outbox_messages"
+
+    chat_id: M[int] = column(type_=BIGINT, index=True)
+    kind: M[str] = column(doc="subscription_created, report")
+    payload: M[dict] = column(type_=JSON)
+    attempts: M[int] = column(server_default=text("0"))
+    available_at: M[dt.datetime] = column(server_default=sql_utcnow, index=True, doc="UTC")
+    last_error: M[str | None]
+
+
 class Payment(BaseMixin, Base):
     __tablename__ = "payments"
 
@@ -0,0 +1,17 @@
+import datetime as dt
+
+from api.services.report_scheduler import ReportSchedulerService
+
+WEEK = 7 * 24 * 60 * 60
+
+
+def test_first_report_at_keeps_phase_across_days():
+    first = ReportSchedulerService.first_report_at(dt.datetime(2024, 5, 6, 10, 30), "username", WEEK)
+    second = ReportSchedulerService.first_report_at(dt.datetime(2024, 5, 9, 23, 5), "username", WEEK)
+    assert (second - first).total_seconds() % WEEK == 0
+
+
+def test_first_report_at_is_nearest_slot():
+    now = dt.datetime(2024, 5, 6, 10, 30)
+    slot = ReportSchedulerService.first_report_at(now, "username", WEEK)
+    assert now <= slot < now + dt.timedelta(seconds=WEEK)